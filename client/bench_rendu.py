@@ -0,0 +1,210 @@
+import argparse
+import importlib
+import math
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+# commun/ (protocole partagé avec le serveur) est à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from commun.mesures import percentile
+from commun.regles import BOUNDS, HEIGHT, MAX_INPUT_DT, WIDTH, overlaps, timed_target, try_move
+from pilote import script_line
+from reseau import NET_TICK
+
+# Benchmark de la boucle de rendu : fait tourner main() de client/main.py
+# ou client/test.py sans fenêtre (--headless), avec des entrées rejouées,
+# face à un serveur synthétique qui envoie N joueurs en mouvement et M
+# balles au rythme du réseau. Pour chaque population : durée des images,
+# p50/p95/p99/max, découpée en phases :
+#   réseau      messages du thread réseau appliqués, interpolation, réconciliation
+#   simulation  entrées, prédiction de notre joueur, statistiques de l'overlay
+#   dessin      effacement, sprites, pseudos, balles, overlay, envoi à l'écran
+#
+#   python client/bench_rendu.py --client test --joueurs 4,16,64 --balles 0,200
+
+PLAYER_ID = "1"
+
+
+class SyntheticNetwork:
+    # Même interface que reseau.Network pour main() : un thread qui, à
+    # chaque tick réseau, fait tourner les autres joueurs en rond, applique
+    # nos entrées avec les règles du serveur, avance les balles (remplacées
+    # quand elles sortent de l'écran) et dépose l'état (complet puis diffs) dans la boîte aux lettres.
+
+    def __init__(self, n_players, n_bullets, seed=1):
+        self.rng = random.Random(seed)
+        self.n_bullets = n_bullets
+        self.inputs = deque()
+        self.mailbox = queue.SimpleQueue()
+        self.running = False
+        self.version = 0
+        self.sim_time = 0.0
+        self.next_bullet = 1
+        self.players = {PLAYER_ID: {"x": 295.0, "y": 215.0, "name": "bench", "seq": 0}}
+        self.paths = {}  # {pid: (centre x, centre y, rayon, phase, vitesse angulaire)}
+        for i in range(2, n_players + 1):
+            pid = str(i)
+            self.paths[pid] = (self.rng.uniform(100, BOUNDS[0] - 100), self.rng.uniform(100, BOUNDS[1] - 100),
+                               self.rng.uniform(20, 100), self.rng.uniform(0, 2 * math.pi), self.rng.uniform(1, 3))
+            self.players[pid] = {"x": 0.0, "y": 0.0, "name": f"joueur{i}", "seq": 0}
+        self._move_others()
+        self.bullets = {}
+        for _ in range(n_bullets):
+            self._add_bullet()
+
+    def _move_others(self):
+        for pid, (cx, cy, r, phase, w) in self.paths.items():
+            a = phase + w * self.sim_time
+            self.players[pid]["x"] = cx + r * math.cos(a)
+            self.players[pid]["y"] = cy + r * math.sin(a)
+
+    def _add_bullet(self):
+        bid = self.next_bullet
+        self.next_bullet += 1
+        a = self.rng.uniform(0, 2 * math.pi)
+        self.bullets[bid] = {"id": bid, "shooter": str(self.rng.randint(2, max(2, len(self.players)))),
+                             "x": self.rng.uniform(0, WIDTH), "y": self.rng.uniform(0, HEIGHT),
+                             "vx": math.cos(a), "vy": math.sin(a), "speed": 500}
+        return self.bullets[bid]
+
+    def _player_fields(self, pid, full):
+        p = self.players[pid]
+        fields = {"x": p["x"], "y": p["y"], "seq": p["seq"]}
+        if full:
+            fields["name"] = p["name"]
+        return fields
+
+    def join(self, name):
+        self.players[PLAYER_ID]["name"] = name
+        players = {pid: self._player_fields(pid, True) for pid in self.players}
+        return 200, {"status": "ok", "player_id": PLAYER_ID, "token": "bench", "room": "1", "players": players}
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def send(self, cmd):
+        self.inputs.append(cmd)
+
+    def messages(self):
+        while True:
+            try:
+                yield self.mailbox.get_nowait()
+            except queue.Empty:
+                return
+
+    def request_resume(self):
+        pass
+
+    def close(self):
+        self.running = False
+
+    def _run(self):
+        self._publish(full=True, removed=[], added=list(self.bullets.values()))
+        n = 0
+        while self.running:
+            time.sleep(NET_TICK)
+            self.sim_time += NET_TICK
+            self._move_others()
+            me = self.players[PLAYER_ID]
+            others = [(p["x"], p["y"]) for pid, p in self.players.items() if pid != PLAYER_ID]
+            while self.inputs:
+                cmd = self.inputs.popleft()
+                if "dt" in cmd:
+                    nx, ny = timed_target(me["x"], me["y"], cmd["dx"], cmd["dy"], min(cmd["dt"], MAX_INPUT_DT))
+                    me["x"], me["y"] = try_move(me["x"], me["y"], nx, ny,
+                                                lambda cx, cy: any(overlaps(cx, cy, ox, oy) for ox, oy in others))
+                me["seq"] = cmd["seq"]
+            # les balles avancent comme sur le serveur ; celles qui sortent
+            # sont supprimées et remplacées
+            removed = []
+            for bid, b in list(self.bullets.items()):
+                b["x"] += b["vx"] * b["speed"] * NET_TICK
+                b["y"] += b["vy"] * b["speed"] * NET_TICK
+                if not (0 <= b["x"] <= WIDTH and 0 <= b["y"] <= HEIGHT):
+                    del self.bullets[bid]
+                    removed.append(bid)
+            added = [self._add_bullet() for _ in removed]
+            self._publish(full=False, removed=removed, added=added)
+            if n % 20 == 0:
+                self.mailbox.put(("ping", 30))
+            n += 1
+
+    def _publish(self, full, removed, added):
+        since = self.version
+        self.version += 1
+        state = {"type": "state", "version": self.version, "time": self.sim_time,
+                 "players": {pid: self._player_fields(pid, full) for pid in self.players},
+                 "bullets": [dict(b) for b in added], "received": time.time()}
+        if full:
+            state["full"] = True
+        else:
+            state["since"] = since
+            if removed:
+                state["removed"] = removed
+        self.mailbox.put(("state", state))
+
+
+class FrameTimes:
+    PHASES = ("réseau", "simulation", "dessin")
+
+    def __init__(self):
+        self.samples = {phase: [] for phase in self.PHASES + ("total",)}
+
+    def frame(self, *durations):
+        for phase, seconds in zip(self.PHASES, durations):
+            self.samples[phase].append(seconds)
+        self.samples["total"].append(sum(durations))
+
+
+def write_script(path, frames, shots):
+    # on tourne en carré ; un tir toutes les 30 images si le client tire
+    directions = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+    with open(path, "w") as f:
+        for i in range(frames):
+            ix, iy = directions[i // 40 % 4]
+            shot = (320, 240) if shots and i % 30 == 0 else None
+            f.write(script_line(ix, iy, shot))
+
+
+def report(times, n_players, n_bullets):
+    print(f"{n_players} joueurs, {n_bullets} balles, {len(times.samples['total'])} images")
+    print(f"  {'phase':<11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for phase, values in times.samples.items():
+        values = sorted(values)
+        print(f"  {phase:<11} {percentile(values, 50) * 1000:>8.3f} {percentile(values, 95) * 1000:>8.3f} "
+              f"{percentile(values, 99) * 1000:>8.3f} {(values[-1] if values else 0) * 1000:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la boucle de rendu du client")
+    parser.add_argument("--client", choices=("main", "test"), default="test",
+                        help="client/main.py ou client/test.py (avec tir et balles)")
+    parser.add_argument("--images", type=int, default=600, help="images par mesure")
+    parser.add_argument("--joueurs", default="4,16,64", help="populations de joueurs (liste)")
+    parser.add_argument("--balles", default="0,200", help="populations de balles (liste)")
+    parser.add_argument("--fps", type=int, default=0, help="images par seconde max (0 : sans limite)")
+    args = parser.parse_args()
+
+    client = importlib.import_module(args.client)
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, "entrees.jsonl")
+        write_script(script, args.images, args.client == "test")
+        for n_players in (int(v) for v in args.joueurs.split(",")):
+            for n_bullets in (int(v) for v in args.balles.split(",")):
+                times = FrameTimes()
+                client.main(["--headless", "--nom", "bench", "--entrees", script,
+                             "--images", str(args.images), "--fps", str(args.fps)],
+                            net=SyntheticNetwork(n_players, n_bullets), timer=times)
+                report(times, n_players, n_bullets)
+
+
+if __name__ == "__main__":
+    main()
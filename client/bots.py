@@ -0,0 +1,213 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+# commun/ (protocole partagé avec le serveur) est à la racine du dépôt
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from commun import protocole
+from commun.mesures import percentile
+
+# Générateur de charge : N joueurs sans fenêtre, un thread chacun, qui font
+# la même boucle que client/main.py (join, lot d'entrées, /state?since=)
+# à un rythme réglable. À la fin : débit, latences p50/p95/p99 et taux
+# d'erreur par route.
+#
+#   python client/bots.py --start beta.py --bots 40 --duree 30 --tirs 2
+
+WIDTH, HEIGHT = 640, 480
+SERVER = "http://127.0.0.1:6789"
+
+
+class Stats:
+    # mesures d'un bot, fusionnées à la fin (pas de verrou partagé pendant le test)
+
+    def __init__(self):
+        self.latencies = {}  # {route: [secondes]}
+        self.errors = {}  # {route: nombre}
+
+    def record(self, route, seconds, ok):
+        self.latencies.setdefault(route, []).append(seconds)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def merge(self, other):
+        for route, values in other.latencies.items():
+            self.latencies.setdefault(route, []).extend(values)
+        for route, count in other.errors.items():
+            self.errors[route] = self.errors.get(route, 0) + count
+
+
+class Bot:
+    def __init__(self, n, args, stop):
+        self.name = f"bot{n}"
+        self.args = args
+        self.stop = stop
+        self.session = requests.Session()  # keep-alive, comme un vrai client
+        self.stats = Stats()
+        self.token = None
+        self.player_id = None
+        self.room = None
+        self.version = -1
+        self.seq = 0
+        self.deaths = 0
+
+    def call(self, route, method, expected=(200, 304), **kwargs):
+        start = time.perf_counter()
+        try:
+            res = self.session.request(method, f"{self.args.server}/{route}", timeout=2, **kwargs)
+            ok = res.status_code in expected
+        except requests.RequestException:
+            res, ok = None, False
+        self.stats.record(route, time.perf_counter() - start, ok)
+        return res if ok else None
+
+    def headers(self, extra=None):
+        headers = {"Authorization": f"Bearer {self.token}"}
+        headers.update(extra or {})
+        return headers
+
+    def join(self):
+        res = self.call("join", "POST", json={"name": self.name})
+        if res is None:
+            return False
+        data = res.json()
+        self.token, self.player_id, self.room = data["token"], data["player_id"], data["room"]
+        self.version = -1
+        return True
+
+    def send_inputs(self, inputs):
+        # 401 : le bot a été tué (beta.py), sa session est fermée
+        batch = {"player_id": self.player_id, "inputs": inputs}
+        if self.args.binaire:
+            res = self.call("inputs", "POST", (200, 401), data=protocole.encode_input(batch),
+                            headers=self.headers({"Content-Type": protocole.CONTENT_TYPE}))
+        else:
+            res = self.call("inputs", "POST", (200, 401), json=batch, headers=self.headers())
+        return res is None or res.status_code != 401
+
+    def get_state(self):
+        accept = {"Accept": protocole.CONTENT_TYPE} if self.args.binaire else {}
+        params = {"room": self.room, "since": self.version}
+        if self.args.vue:
+            params["view"] = self.args.vue
+        res = self.call("state", "GET", (200, 304, 401), params=params, headers=self.headers(accept))
+        if res is None or res.status_code != 200:
+            return
+        if self.args.binaire:
+            self.version = protocole.decode_state(res.content)["version"]
+        else:
+            self.version = res.json()["version"]
+
+    def run(self):
+        if not self.join():
+            return
+        tick = 1 / self.args.reseau
+        frame = 1 / 60
+        direction = (1, 0)
+        next_tick = time.perf_counter()
+        while not self.stop.is_set():
+            # un lot par tick réseau avec les entrées des images écoulées, comme
+            # le vrai client ; la direction change de temps en temps
+            inputs = []
+            for _ in range(max(1, round(tick / frame))):
+                if random.random() < 0.05:
+                    direction = (random.choice((-1, 0, 1)), random.choice((-1, 0, 1)))
+                self.seq += 1
+                inputs.append({"seq": self.seq, "t": time.time(), "dt": frame, "dx": direction[0], "dy": direction[1]})
+            if random.random() < self.args.tirs * tick:
+                self.seq += 1
+                inputs.append({"seq": self.seq, "t": time.time(),
+                               "mx": random.uniform(0, WIDTH), "my": random.uniform(0, HEIGHT)})
+            if self.send_inputs(inputs):
+                self.get_state()
+            else:
+                self.deaths += 1
+                if not self.join():
+                    return
+
+            next_tick += tick
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()
+        # 401/404 : session déjà fermée par le serveur (tué ou sorti depuis le
+        # dernier lot), le départ n'a plus rien à faire et ce n'est pas une erreur
+        self.call("leave", "POST", (200, 401, 404), headers=self.headers())
+
+
+def start_server(script, server):
+    # serveur local sur la boucle locale, prêt quand /metrics répond
+    proc = subprocess.Popen([sys.executable, script], cwd=os.path.join(ROOT, "serveur"),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            requests.get(f"{server}/metrics", timeout=0.5)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"le serveur {script} ne répond pas")
+
+
+def report(stats, elapsed, bots, deaths):
+    print(f"{bots} bots, {elapsed:.1f} s, {deaths} morts (rejoints)")
+    print(f"{'route':<8} {'req':>7} {'req/s':>8} {'erreurs':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    total = 0
+    for route in sorted(stats.latencies):
+        values = sorted(stats.latencies[route])
+        errors = stats.errors.get(route, 0)
+        total += len(values)
+        print(f"{route:<8} {len(values):>7} {len(values) / elapsed:>8.1f} {errors / len(values):>7.1%} "
+              f"{percentile(values, 50) * 1000:>8.2f} {percentile(values, 95) * 1000:>8.2f} "
+              f"{percentile(values, 99) * 1000:>8.2f}")
+    print(f"total    {total:>7} {total / elapsed:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bots de charge pour le serveur de jeu")
+    parser.add_argument("--server", default=SERVER)
+    parser.add_argument("--bots", type=int, default=8)
+    parser.add_argument("--duree", type=float, default=10, help="secondes de test")
+    parser.add_argument("--reseau", type=float, default=20, help="ticks réseau par seconde et par bot")
+    parser.add_argument("--tirs", type=float, default=0, help="tirs par seconde et par bot (beta.py)")
+    parser.add_argument("--binaire", action="store_true", help="protocole binaire (commun/protocole.py)")
+    parser.add_argument("--vue", metavar="VUE", help="zone d'intérêt de /state : auto ou x,y,l,h")
+    parser.add_argument("--start", metavar="SCRIPT", help="lance serveur/SCRIPT en local (main.py, beta.py)")
+    args = parser.parse_args()
+
+    server = start_server(args.start, args.server) if args.start else None
+    stop = threading.Event()
+    bots = [Bot(n, args, stop) for n in range(args.bots)]
+    threads = [threading.Thread(target=bot.run, daemon=True) for bot in bots]
+    start = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duree)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        elapsed = time.perf_counter() - start
+        if server is not None:
+            server.terminate()
+
+    stats = Stats()
+    for bot in bots:
+        stats.merge(bot.stats)
+    report(stats, elapsed, args.bots, sum(bot.deaths for bot in bots))
+
+
+if __name__ == "__main__":
+    main()
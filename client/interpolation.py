@@ -0,0 +1,86 @@
+from collections import deque
+
+INTERP_DELAY = 0.1  # retard d'affichage des autres joueurs : deux ticks réseau (reseau.NET_TICK)
+MAX_EXTRAPOLATION = 0.05  # au-delà du dernier état reçu, on prolonge le mouvement au plus ce temps
+MAX_SAMPLES = 32
+RESYNC = 1.0  # écart d'horloge au-delà duquel on repart de zéro (nouvelle salle, reprise)
+
+
+class SnapshotBuffer:
+    # Positions des autres joueurs datées par l'horloge de la simulation du
+    # serveur ("time" de chaque état). Le rendu les affiche à un instant
+    # fixe INTERP_DELAY derrière le serveur : à chaque image on interpole
+    # entre les deux états qui encadrent cet instant, quel que soit le rythme
+    # auquel ils arrivent (polling ou push, ping haut ou bas). Si le réseau a
+    # du retard, on prolonge un peu le dernier mouvement, puis on revient à la
+    # dernière position connue (la salle est peut-être simplement immobile).
+    # Ne sert qu'au thread de rendu.
+
+    def __init__(self, delay=INTERP_DELAY):
+        self.delay = delay
+        self.samples = {}  # {pid: deque[(temps serveur, x, y)]}
+        self.offset = None  # heure locale - temps serveur, au plus court trajet vu
+        self.newest = None
+
+    def clear(self):
+        self.samples.clear()
+        self.offset = None
+        self.newest = None
+
+    def push(self, server_time, players, received):
+        # après chaque état appliqué : une position datée pour chaque joueur
+        # connu, y compris ceux qui n'ont pas bougé (un diff les omet)
+        if self.newest is not None and server_time < self.newest:
+            self.clear()  # autre salle : autre horloge
+        offset = received - server_time
+        if self.offset is None or abs(offset - self.offset) > RESYNC:
+            self.offset = offset
+        elif offset < self.offset:
+            self.offset = offset
+        else:
+            # un état arrivé en retard ne compte qu'un peu : l'horloge ne suit
+            # que les dérives lentes, pas la gigue du réseau
+            self.offset += (offset - self.offset) * 0.02
+        self.newest = server_time
+
+        for pid in list(self.samples):
+            if pid not in players:
+                del self.samples[pid]
+        for pid, p in players.items():
+            samples = self.samples.get(pid)
+            if samples is None:
+                samples = self.samples[pid] = deque(maxlen=MAX_SAMPLES)
+            elif samples[-1][0] >= server_time:
+                samples.pop()  # même instant (état complet après un diff) : on remplace
+            samples.append((server_time, float(p["x"]), float(p["y"])))
+
+    def render_time(self, now):
+        # instant du serveur à afficher pour l'heure locale `now`
+        if self.offset is None:
+            return None
+        return now - self.offset - self.delay
+
+    def position(self, pid, t):
+        # position de pid à l'instant serveur t ; None si jamais vu
+        samples = self.samples.get(pid)
+        if not samples:
+            return None
+        # ce qui précède l'instant affiché ne resservira plus
+        while len(samples) > 2 and samples[1][0] <= t:
+            samples.popleft()
+        t0, x0, y0 = samples[0]
+        if t <= t0 or len(samples) == 1:
+            return x0, y0
+        for t1, x1, y1 in samples:
+            if t1 >= t:
+                k = (t - t0) / (t1 - t0)
+                return x0 + (x1 - x0) * k, y0 + (y1 - y0) * k
+            t0, x0, y0 = t1, x1, y1
+        # plus récent que le dernier état : extrapolation courte, puis retour
+        ta, xa, ya = samples[-2]
+        late = t - t0
+        if late > MAX_EXTRAPOLATION:
+            late = max(0.0, 2 * MAX_EXTRAPOLATION - late)
+        vx = (x0 - xa) / (t0 - ta)
+        vy = (y0 - ya) / (t0 - ta)
+        return x0 + vx * late, y0 + vy * late
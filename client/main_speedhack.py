@@ -10,6 +10,7 @@ SERVER = "https://mvivibe.inertiacreeps.net/gameserver"
 
 players = {}
 player_id = None
+token = None  # jeton de session rendu par /join
 running = True
 
 pos_buffer = {}  # positions interpolées {pid: (x_float, y_float)}
@@ -59,7 +60,8 @@ def get_state():
 
 def move(x, y):
     try:
-        return requests.post(f"{SERVER}/move", json={"player_id": player_id, "x": int(x), "y": int(y)}, timeout=1)
+        return requests.post(f"{SERVER}/move", json={"player_id": player_id, "x": int(x), "y": int(y)},
+                             headers={"Authorization": f"Bearer {token}"}, timeout=1)
     except Exception as e:
         print(f"Erreur move: {e}")
         return None
@@ -67,7 +69,7 @@ def move(x, y):
 
 def leave_game():
     try:
-        requests.post(f"{SERVER}/leave", json={"player_id": player_id}, timeout=1)
+        requests.post(f"{SERVER}/leave", headers={"Authorization": f"Bearer {token}"}, timeout=1)
     except Exception as e:
         print(f"Erreur leave_game: {e}")
 
@@ -102,7 +104,7 @@ def draw_info_overlay(screen, font, nb_players):
 
 
 def main():
-    global running, last_sent_time, speed, fps, player_id, players
+    global running, last_sent_time, speed, fps, player_id, token, players
 
     while True:
         name = input("Entrez votre pseudo: ").strip()
@@ -127,6 +129,7 @@ def main():
 
             data = res.json()
             player_id = data["player_id"]
+            token = data["token"]
             players.update(data["players"])
             with lock:
                 for pid, pos in players.items():
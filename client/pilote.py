@@ -0,0 +1,47 @@
+import argparse
+import json
+import os
+
+# Options communes de main.py et test.py, pour faire tourner le client
+# sans écran ni clavier (tests, benchmark : bench_rendu.py) :
+#
+#   python client/main.py --nom alice --server http://127.0.0.1:6789
+#   python client/main.py --headless --nom bot --entrees partie.jsonl
+#   python client/main.py --nom alice --enregistrer partie.jsonl
+#
+# Fichier d'entrées : une ligne JSON par image, {"dx": -1..1, "dy": -1..1}
+# plus "mx", "my" pour un tir. --enregistrer écrit ce que fait le joueur
+# dans ce format, --entrees le rejoue ; la partie s'arrête à la fin du fichier.
+
+
+def parse_args(argv, server):
+    parser = argparse.ArgumentParser(description="Client du jeu")
+    parser.add_argument("--server", default=server)
+    parser.add_argument("--nom", help="pseudo (sinon demandé au clavier)")
+    parser.add_argument("--headless", action="store_true", help="sans fenêtre (pilote vidéo SDL dummy)")
+    parser.add_argument("--entrees", metavar="FICHIER", help="rejoue ces entrées au lieu du clavier et de la souris")
+    parser.add_argument("--enregistrer", metavar="FICHIER", help="enregistre les entrées de chaque image")
+    parser.add_argument("--images", type=int, help="quitte après ce nombre d'images")
+    parser.add_argument("--fps", type=int, default=60, help="images par seconde max (0 : sans limite)")
+    args = parser.parse_args(argv)
+    if args.headless:
+        # avant pygame.init()
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    return args
+
+
+def read_script(path):
+    # entrées d'un fichier, une image à la fois
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def script_line(ix, iy, shot=None):
+    # une image pour --enregistrer
+    frame = {"dx": ix, "dy": iy}
+    if shot is not None:
+        frame["mx"], frame["my"] = shot
+    return json.dumps(frame) + "\n"
@@ -0,0 +1,45 @@
+from collections import deque
+
+from commun.regles import overlaps, timed_target, try_move
+
+MAX_PENDING = 256  # entrées gardées au plus en attente d'acquittement (~4 s à 60 images/s)
+
+
+class Prediction:
+    # Notre joueur, déplacé dès l'image où la touche est enfoncée au lieu
+    # d'attendre l'aller-retour du serveur. Chaque entrée datée est appliquée
+    # tout de suite avec les règles du serveur (commun/regles.py) et gardée
+    # par seq tant que le serveur ne l'a pas traitée. À chaque état reçu, on
+    # repart de la position qui fait foi (après la dernière entrée traitée,
+    # "seq") et on rejoue par-dessus les entrées encore en route : si la
+    # prédiction était juste, rien ne bouge à l'écran. Ne sert qu'au thread
+    # de rendu.
+
+    def __init__(self):
+        self.x = None
+        self.y = None
+        self.pending = deque(maxlen=MAX_PENDING)  # (seq, dx, dy, dt)
+
+    def reset(self, x, y):
+        # /join ou /resume : position du serveur, plus rien en attente
+        self.x, self.y = float(x), float(y)
+        self.pending.clear()
+
+    def apply(self, seq, dx, dy, dt, others):
+        # entrée locale ; others : positions (x, y) des autres joueurs
+        self.pending.append((seq, dx, dy, dt))
+        self.x, self.y = self._step(self.x, self.y, dx, dy, dt, others)
+
+    def reconcile(self, x, y, acked, others):
+        # état du serveur : (x, y) après l'entrée `acked`
+        while self.pending and self.pending[0][0] <= acked:
+            self.pending.popleft()
+        x, y = float(x), float(y)
+        for _, dx, dy, dt in self.pending:
+            x, y = self._step(x, y, dx, dy, dt, others)
+        self.x, self.y = x, y
+
+    @staticmethod
+    def _step(x, y, dx, dy, dt, others):
+        nx, ny = timed_target(x, y, dx, dy, dt)
+        return try_move(x, y, nx, ny, lambda cx, cy: any(overlaps(cx, cy, ox, oy) for ox, oy in others))
@@ -0,0 +1,85 @@
+import pygame
+
+BACKGROUND = (30, 30, 30)
+TEXT_COLOR = (255, 255, 255)
+LABEL_OFFSET = 20  # pseudo affiché au-dessus du joueur
+
+
+class Renderer:
+    # Affichage du client sans rien redessiner qui n'a pas changé :
+    #   - le sprite de chaque joueur (corps, yeux, bouche...) est dessiné une
+    #     fois par couleur dans une surface, son pseudo rendu une fois par nom ;
+    #     le cache d'un joueur saute quand il part ou change de nom ou de couleur
+    #   - le texte de l'overlay n'est rendu que quand ses valeurs changent
+    #   - chaque image efface ce qu'avait dessiné la précédente et n'envoie à
+    #     l'écran que ces rectangles (display.update) au lieu de toute la
+    #     fenêtre (display.flip)
+    # draw_sprite(surface, couleur) dessine un joueur dans une surface
+    # transparente de taille sprite_size, coin haut-gauche en (0, 0).
+
+    def __init__(self, screen, font, draw_sprite, sprite_size):
+        self.screen = screen
+        self.font = font
+        self.draw_sprite = draw_sprite
+        self.sprite_size = sprite_size
+        self.sprites = {}  # {couleur: surface}
+        self.players = {}  # {pid: ((pseudo, couleur), sprite, pseudo rendu)}
+        self.overlay_lines = None
+        self.overlay = []  # lignes de l'overlay déjà rendues
+        self.dirty = []  # rectangles dessinés pendant l'image en cours
+        self.previous = []  # ... et pendant la précédente (à effacer)
+        self.full = True  # prochaine image : toute la fenêtre
+
+    def redraw(self):
+        # fenêtre recouverte puis réaffichée : tout repeindre à la prochaine image
+        self.full = True
+
+    def begin(self):
+        if self.full:
+            self.screen.fill(BACKGROUND)
+        else:
+            for rect in self.dirty:
+                self.screen.fill(BACKGROUND, rect)
+        self.previous = self.dirty
+        self.dirty = []
+
+    def end(self):
+        if self.full:
+            pygame.display.flip()
+            self.full = False
+        else:
+            pygame.display.update(self.previous + self.dirty)
+
+    def blit(self, surface, pos):
+        self.dirty.append(self.screen.blit(surface, pos))
+
+    def forget(self, pids):
+        # joueurs partis : leurs surfaces ne resserviront plus
+        for pid in list(self.players):
+            if pid not in pids:
+                del self.players[pid]
+
+    def player(self, pid, name, color, x, y):
+        key = (name, color)
+        cached = self.players.get(pid)
+        if cached is None or cached[0] != key:
+            sprite = self.sprites.get(color)
+            if sprite is None:
+                sprite = pygame.Surface(self.sprite_size, pygame.SRCALPHA)
+                self.draw_sprite(sprite, color)
+                sprite = self.sprites[color] = sprite.convert_alpha()
+            cached = self.players[pid] = (key, sprite, self.font.render(name, True, TEXT_COLOR).convert_alpha())
+        _, sprite, label = cached
+        self.blit(sprite, (x, y))
+        self.blit(label, (x, y - LABEL_OFFSET))
+
+    def circle(self, color, center, radius):
+        self.dirty.append(pygame.draw.circle(self.screen, color, center, radius))
+
+    def info(self, lines):
+        # overlay en haut à gauche, une surface par ligne
+        if lines != self.overlay_lines:
+            self.overlay_lines = lines
+            self.overlay = [self.font.render(line, True, TEXT_COLOR).convert_alpha() for line in lines]
+        for i, text in enumerate(self.overlay):
+            self.blit(text, (10, 10 + 20 * i))
@@ -0,0 +1,231 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from commun import protocole
+from transport_ws import WsTransport
+
+NET_TICK = 0.05  # tick réseau : envoi des entrées et /state, 20 fois par seconde
+MAX_FAILS = 5
+KEEPALIVE = 5  # sans entrée depuis ce délai, on signale qu'on est toujours là
+
+
+class Network:
+    # Tout le réseau du client, hors du thread de rendu. Une seule session
+    # HTTP keep-alive (connexions TCP/TLS gardées dans un pool) ou le
+    # websocket ; un thread réseau qui vide la file d'entrées à chaque tick
+    # réseau et demande l'état. Le thread de rendu ne fait jamais d'appel
+    # réseau pendant la partie : il dépose ses entrées avec send() et lit à
+    # chaque image les messages reçus avec messages() :
+    #   ("state", état)    état complet ou diff, déjà remis dans l'ordre des versions,
+    #                      avec son heure de réception locale ("received")
+    #   ("joined", rép.)   session reprise (/resume), même réponse que /join
+    #   ("ping", ms)       aller-retour mesuré
+    #   ("lost", raison)   plus de joueur ni de session : fin de partie
+
+    def __init__(self, server, binary=True, use_ws=True):
+        self.server = server
+        self.binary = binary
+        self.use_ws = use_ws
+        self.session = requests.Session()
+        self.session.mount(server, HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.inputs = deque()  # rendu -> réseau
+        self.mailbox = queue.SimpleQueue()  # réseau -> rendu
+        self.player_id = None
+        self.room_id = None
+        self.token = None
+        self.version = -1  # dernière version d'état transmise au rendu
+        self.transport = None
+        self.running = False
+        self.fail_count = 0
+        self.last_flush = 0
+        self.last_seq = 0
+        self._resume = threading.Event()
+
+    # --- thread de rendu ---
+
+    def join(self, name):
+        # avant la partie, bloquant : (code http, réponse de /join)
+        res = self.session.post(f"{self.server}/join", json={"name": name}, timeout=2)
+        data = res.json() if res.headers.get("Content-Type", "").startswith("application/json") else {}
+        if res.status_code == 200:
+            self._enter(data)
+        return res.status_code, data
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def send(self, cmd):
+        # entrée datée ou tir, partira au prochain tick réseau (dans l'ordre)
+        self.inputs.append(cmd)
+
+    def messages(self):
+        while True:
+            try:
+                yield self.mailbox.get_nowait()
+            except queue.Empty:
+                return
+
+    def request_resume(self):
+        # notre joueur a disparu de l'état : le thread réseau tente /resume
+        self._resume.set()
+
+    def close(self):
+        self.running = False
+        if self.transport is not None:
+            self.transport.close()
+        try:
+            self.session.post(f"{self.server}/leave", headers=self._headers(), timeout=1)
+        except Exception as e:
+            print(f"Erreur leave_game: {e}")
+
+    # --- thread réseau ---
+
+    def _headers(self, headers=None):
+        headers = dict(headers or {})
+        headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    def _enter(self, data):
+        self.player_id = data["player_id"]
+        self.room_id = data.get("room")
+        self.token = data["token"]
+        self.version = -1
+
+    def _run(self):
+        if self.use_ws:
+            try:
+                self.transport = WsTransport(self.server, self._receive, self.room_id, self.binary, self.token)
+                self.transport.connect()
+                threading.Thread(target=self.transport.receive_loop, args=(lambda: self.running,),
+                                 daemon=True).start()
+            except Exception as e:
+                print(f"Websocket indisponible ({e}), polling HTTP.")
+                self.transport = None
+        n = 0
+        while self.running:
+            start = time.time()
+            if self._resume.is_set():
+                self._resume.clear()
+                if not self._try_resume():
+                    self._lost("Joueur introuvable, déconnexion.")
+                    return
+            self._flush()
+            if self.transport is not None and self.transport.connected:
+                if n % 20 == 0:
+                    self.transport.ping()
+            else:
+                if self.transport is not None:
+                    print("Connexion websocket perdue, retour au polling HTTP.")
+                    self.transport = None
+                self._poll()
+                if self.fail_count >= MAX_FAILS:
+                    # trop d'échecs : on tente de reprendre la session, sinon déco
+                    if not self._try_resume():
+                        self._lost("Déconnexion du serveur après trop d'échecs.")
+                        return
+                    self.fail_count = 0
+            n += 1
+            time.sleep(max(0.0, NET_TICK - (time.time() - start)))
+
+    def _lost(self, reason):
+        self.running = False
+        self.mailbox.put(("lost", reason))
+
+    def _receive(self, msg):
+        # état (polling ou push) ou pong ; un diff qui ne part pas de notre
+        # version n'est pas transmis, on redemande un état complet
+        kind = msg.get("type")
+        if kind == "pong" and msg.get("t") is not None:
+            self.mailbox.put(("ping", int((time.time() - msg["t"]) * 1000)))
+            return
+        if kind != "state":
+            return
+        if not msg.get("full"):
+            if msg["version"] <= self.version:
+                return
+            if msg["since"] > self.version:
+                self.version = -1
+                if self.transport is not None and self.transport.connected:
+                    self.transport.send({"type": "resync"})
+                return
+        self.version = msg["version"]
+        msg["received"] = time.time()  # pour caler l'horloge du serveur (interpolation.py)
+        self.mailbox.put(("state", msg))
+
+    def _post_input(self, route, data):
+        if self.binary:
+            return self.session.post(f"{self.server}/{route}", data=protocole.encode_input(data),
+                                     headers=self._headers({"Content-Type": protocole.CONTENT_TYPE}), timeout=1)
+        return self.session.post(f"{self.server}/{route}", json=data, headers=self._headers(), timeout=1)
+
+    def _flush(self):
+        # un seul envoi pour toutes les entrées accumulées depuis le tick réseau
+        # précédent ; en cas d'échec réseau elles repartent au tick suivant
+        inputs = []
+        while self.inputs:
+            inputs.append(self.inputs.popleft())
+        if not inputs:
+            if time.time() - self.last_flush < KEEPALIVE:
+                return
+            # entrée vide (seq déjà envoyé) : le serveur ne nous sort pas pour inactivité
+            inputs.append({"seq": self.last_seq})
+        self.last_flush = time.time()
+        self.last_seq = inputs[-1]["seq"]
+        batch = {"player_id": self.player_id, "inputs": inputs}
+        if self.transport is not None and self.transport.connected:
+            if self.transport.send({"type": "inputs", **batch}):
+                return
+        else:
+            try:
+                self._post_input("inputs", batch)
+                return
+            except Exception as e:
+                print(f"Erreur inputs: {e}")
+        self.inputs.extendleft(reversed(inputs))
+
+    def _poll(self):
+        try:
+            start = time.time()
+            headers = self._headers({"Accept": protocole.CONTENT_TYPE} if self.binary else {})
+            res = self.session.get(f"{self.server}/state", params={"room": self.room_id, "since": self.version},
+                                   headers=headers, timeout=1)
+            if res.status_code in (200, 304):
+                # 304 : rien n'a changé côté serveur depuis notre version
+                if res.status_code == 200:
+                    if res.headers.get("Content-Type", "").startswith(protocole.CONTENT_TYPE):
+                        self._receive(protocole.decode_state(res.content))
+                    else:
+                        self._receive(res.json())
+                self.mailbox.put(("ping", int((time.time() - start) * 1000)))
+                self.fail_count = 0
+                return
+            print(f"Erreur serveur state: {res.status_code}")
+        except Exception as e:
+            print(f"Erreur get_state: {e}")
+        self.fail_count += 1
+
+    def _try_resume(self):
+        # connexion perdue ou sortis pour inactivité : on reprend notre joueur
+        # avec le jeton, sans repasser par /join
+        try:
+            res = self.session.post(f"{self.server}/resume", headers=self._headers(), timeout=2)
+        except Exception as e:
+            print(f"Erreur resume: {e}")
+            return False
+        if res.status_code != 200:
+            return False
+        old_room = self.room_id
+        data = res.json()
+        self._enter(data)
+        if self.transport is not None and self.room_id != old_room:
+            # le websocket suit l'ancienne salle : retour au polling
+            self.transport.close()
+        self.mailbox.put(("joined", data))
+        print("Session reprise.")
+        return True
@@ -1,33 +1,43 @@
+import os
+import sys
 import pygame
-import requests
-import threading
 import time
 import math
 
-WIDTH, HEIGHT = 640, 480
-PLAYER_SIZE = 50
-SPEED = 300  # pixels par seconde (ajusté pour dt)
+# commun/ (protocole partagé avec le serveur) est à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from commun.regles import HEIGHT, MAX_INPUT_DT, PLAYER_SIZE, WIDTH
+from interpolation import SnapshotBuffer
+from pilote import parse_args, read_script, script_line
+from prediction import Prediction
+from rendu import Renderer
+from reseau import NET_TICK, Network
+
 SERVER = "https://mvivibe.inertiacreeps.net/gameserver"
+USE_WS = True  # état poussé par le serveur via /ws, repli sur le polling HTTP sinon
+BINARY = True  # protocole binaire compact (commun/protocole.py) au lieu du JSON
 
+# état du jeu : n'appartient qu'au thread de rendu, le réseau (reseau.py)
+# lui transmet les états reçus par messages
 players = {}
 player_id = None
 running = True
 
-pos_buffer = {}  # positions interpolées {pid: (x_float, y_float)}
-lock = threading.Lock()
+pos_buffer = {}  # positions affichées {pid: (x_float, y_float)}
+snapshots = SnapshotBuffer()  # positions datées par le serveur, pour les autres joueurs
+prediction = Prediction()  # notre joueur, déplacé sans attendre le serveur
 
 ping_ms = 0
 speed = 0
 fps = 0
-last_sent_time = 0
 
 ping_history = []
 speed_history = []
 fps_history = []
 MAX_HISTORY = 10
 
-fail_count = 0
-MAX_FAILS = 5
+input_seq = 0
 
 # Ajout: liste des balles en vol
 # Chaque balle = dict avec : x,y, vecteur (vx, vy), vitesse, tireur
@@ -37,211 +47,252 @@ BULLET_SPEED = 500  # px/s
 BULLET_SIZE = 10
 
 
-def get_state():
-    global players, bullets, ping_ms, fail_count
-    try:
-        start = time.time()
-        res = requests.get(f"{SERVER}/state", timeout=1)
-        ping_sample = int((time.time() - start) * 1000)
-        if res.status_code == 200:
-            with lock:
-                data = res.json()
-                players = data.get("players", {})
-                bullets = data.get("bullets", [])
-                for pid, pos in players.items():
-                    new_x, new_y = float(pos["x"]), float(pos["y"])
-                    if pid in pos_buffer:
-                        old_x, old_y = pos_buffer[pid]
-                        interp_x = old_x + (new_x - old_x) * 0.2
-                        interp_y = old_y + (new_y - old_y) * 0.2
-                        pos_buffer[pid] = (interp_x, interp_y)
-                    else:
-                        pos_buffer[pid] = (new_x, new_y)
-            fail_count = 0
-            return ping_sample
-        else:
-            print(f"Erreur serveur state: {res.status_code}")
-    except Exception as e:
-        print(f"Erreur get_state: {e}")
-    fail_count += 1
-    return None
-
-
-def move(x, y):
-    try:
-        return requests.post(f"{SERVER}/move", json={"player_id": player_id, "x": int(x), "y": int(y)}, timeout=1)
-    except Exception as e:
-        print(f"Erreur move: {e}")
-        return None
-
-
-def leave_game():
-    try:
-        requests.post(f"{SERVER}/leave", json={"player_id": player_id}, timeout=1)
-    except Exception as e:
-        print(f"Erreur leave_game: {e}")
-
-
-def polling_loop():
-    global ping_ms, running
-    while running:
-        ping_sample = get_state()
-        if ping_sample is not None:
-            ping_history.append(ping_sample)
-            if len(ping_history) > MAX_HISTORY:
-                ping_history.pop(0)
-            ping_ms = int(sum(ping_history) / len(ping_history))
-        else:
-            if fail_count >= MAX_FAILS:
-                print("Déconnexion du serveur après trop d'échecs.")
-                running = False
-        time.sleep(0.05)
-
-
-def draw_info_overlay(screen, font, nb_players):
-    info_lines = [
+def apply_state(data):
+    # état complet ou diff, déjà remis dans l'ordre par le réseau
+    global players, bullets
+    if data.get("full"):
+        players = data["players"]
+        bullets = data.get("bullets", [])
+    else:
+        for pid, fields in data.get("players", {}).items():
+            players.setdefault(pid, {}).update(fields)
+        for pid in data.get("left", []):
+            players.pop(pid, None)
+        removed = set(data.get("removed", []))
+        if removed:
+            bullets = [b for b in bullets if b.get("id") not in removed]
+        known = {b.get("id") for b in bullets}
+        bullets.extend(b for b in data.get("bullets", []) if b["id"] not in known)
+
+
+def move_bullets(dt):
+    # le serveur n'envoie une balle qu'à son tir puis à sa suppression :
+    # entre les deux on l'avance ici à chaque image ; celles qui sortent de
+    # l'écran disparaissent (les touches, c'est le serveur qui les décide)
+    global bullets
+    for b in bullets:
+        b["x"] += b["vx"] * b["speed"] * dt
+        b["y"] += b["vy"] * b["speed"] * dt
+    bullets = [b for b in bullets if 0 <= b["x"] <= WIDTH and 0 <= b["y"] <= HEIGHT]
+
+
+def interpolate_positions(now):
+    # autres joueurs : à chaque image, leur position à l'instant affiché
+    # (un peu derrière le serveur), entre les deux états qui l'encadrent
+    t = snapshots.render_time(now)
+    for pid, pos in players.items():
+        if pid == player_id:
+            continue
+        interp = snapshots.position(pid, t) if t is not None else None
+        pos_buffer[pid] = interp if interp is not None else (float(pos["x"]), float(pos["y"]))
+
+
+def other_positions():
+    # positions des autres joueurs selon le serveur, pour prédire les collisions
+    return [(p["x"], p["y"]) for pid, p in players.items() if pid != player_id]
+
+
+def reconcile():
+    # notre position qui fait foi et la dernière entrée qu'elle inclut,
+    # puis les entrées pas encore traitées rejouées par-dessus
+    me = players.get(player_id)
+    if me is None:
+        return
+    prediction.reconcile(me["x"], me["y"], me.get("seq", 0), other_positions())
+    pos_buffer[player_id] = (prediction.x, prediction.y)
+
+
+def enter_game(data):
+    # réponse de /join ou /resume : notre joueur et l'état complet
+    global player_id, players
+    player_id = data["player_id"]
+    players = data["players"]
+    snapshots.clear()
+    for pid, pos in players.items():
+        pos_buffer[pid] = (float(pos["x"]), float(pos["y"]))
+    prediction.reset(*pos_buffer[player_id])
+
+
+def record_ping(ping_sample):
+    global ping_ms
+    ping_history.append(ping_sample)
+    if len(ping_history) > MAX_HISTORY:
+        ping_history.pop(0)
+    ping_ms = int(sum(ping_history) / len(ping_history))
+
+
+def read_messages(net):
+    # messages du thread réseau arrivés depuis l'image précédente
+    global running
+    for kind, data in net.messages():
+        if kind == "state":
+            apply_state(data)
+            snapshots.push(data["time"], players, data["received"])
+            reconcile()
+        elif kind == "joined":
+            enter_game(data)
+        elif kind == "ping":
+            record_ping(data)
+        elif kind == "lost":
+            print(data)
+            running = False
+
+
+def info_lines(nb_players):
+    # texte de l'overlay ; rendu.Renderer ne le redessine que s'il change
+    return (
         f"Ping moyen: {int(ping_ms)} ms",
         f"Joueurs: {nb_players}",
         f"Vitesse moyenne: {int(speed)} px/s",
         f"FPS moyen: {int(fps)}"
-    ]
-    for i, line in enumerate(info_lines):
-        text = font.render(line, True, (255, 255, 255))
-        screen.blit(text, (10, 10 + 20 * i))
-
-
-def main():
-    global running, last_sent_time, speed, fps, player_id, players, bullets
+    )
+
+
+def draw_player(surface, color):
+    # sprite d'un joueur et de son arme, dessiné une fois par couleur (rendu.py)
+    pygame.draw.rect(surface, color, (0, 0, PLAYER_SIZE, PLAYER_SIZE))
+    pygame.draw.rect(surface, (36, 46, 56), (10, 10, 10, 10))
+    pygame.draw.rect(surface, (36, 46, 56), (30, 10, 10, 10))
+    pygame.draw.rect(surface, (36, 46, 56), (10, 30, 10, 10))
+    pygame.draw.rect(surface, (36, 46, 56), (20, 30, 10, 10))
+    pygame.draw.rect(surface, (36, 46, 56), (30, 30, 10, 10))
+    pygame.draw.rect(surface, (198, 198, 198), (50, 30, 10, 10))
+    pygame.draw.rect(surface, (198, 198, 198), (50, 20, 10, 10))
+    pygame.draw.rect(surface, (198, 198, 198), (60, 20, 10, 10))
+
+
+def join_game(net, name):
+    # True : en jeu ; False : on peut réessayer avec un autre pseudo ;
+    # None : inutile d'insister (serveur plein ou injoignable)
+    if not name:
+        print("Veuillez entrer un pseudo valide.")
+        return False
+    try:
+        status, data = net.join(name)
+    except Exception as e:
+        print(f"Erreur de connexion au serveur: {e}")
+        return None
+    if status == 403:
+        print("Serveur plein.")
+        return None
+    elif status == 409:
+        print("Ce pseudo est déjà pris. Veuillez en choisir un autre.")
+        return False
+    elif status == 400:
+        print("Nom invalide. Essayez encore.")
+        return False
+    elif status != 200:
+        print(f"Erreur inconnue : {status}")
+        return False
+    enter_game(data)
+    return True
+
+
+def main(argv=None, net=None, timer=None):
+    # net : réseau déjà prêt (bench_rendu.py en fournit un synthétique) ;
+    # timer.frame(réseau, simulation, dessin) reçoit la durée de chaque phase de l'image
+    global running, input_seq, speed, fps
+    args = parse_args(argv, SERVER)
+    if net is None:
+        net = Network(args.server, BINARY, USE_WS)
 
     while True:
-        name = input("Entrez votre pseudo: ").strip()
-        if not name:
-            print("Veuillez entrer un pseudo valide.")
-            continue
-
-        try:
-            res = requests.post(f"{SERVER}/join", json={"name": name}, timeout=2)
-            if res.status_code == 403:
-                print("Serveur plein.")
-                return
-            elif res.status_code == 409:
-                print("Ce pseudo est déjà pris. Veuillez en choisir un autre.")
-                continue
-            elif res.status_code == 400:
-                print("Nom invalide. Essayez encore.")
-                continue
-            elif res.status_code != 200:
-                print(f"Erreur inconnue : {res.status_code}")
-                continue
-
-            data = res.json()
-            player_id = data["player_id"]
-            players.update(data["players"])
-            with lock:
-                for pid, pos in players.items():
-                    pos_buffer[pid] = (float(pos["x"]), float(pos["y"]))
+        name = args.nom if args.nom is not None else input("Entrez votre pseudo: ").strip()
+        joined = join_game(net, name)
+        if joined:
             break
-        except Exception as e:
-            print(f"Erreur de connexion au serveur: {e}")
+        if joined is None or args.nom is not None:
             return
 
-    threading.Thread(target=polling_loop, daemon=True).start()
+    net.start()
+    script = read_script(args.entrees) if args.entrees else None
+    record = open(args.enregistrer, "w") if args.enregistrer else None
 
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Jeu HTTP Multijoueur Fluide")
     clock = pygame.time.Clock()
     font = pygame.font.SysFont(None, 24)
+    renderer = Renderer(screen, font, draw_player, (PLAYER_SIZE + 20, PLAYER_SIZE))
+    resuming = False  # /resume demandé au thread réseau, en attente de sa réponse
+    frames = 0
 
     while running:
-        dt = clock.tick(60) / 1000
+        dt = clock.tick(args.fps) / 1000
         now = time.time()
+        start = time.perf_counter()
+        shot = None  # tir de cette image (clic ou entrée rejouée)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.redraw()
 
             # Ajout : gestion clic souris -> tir
-            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # clic gauche
-                with lock:
-                    if player_id in pos_buffer:
-                        mx, my = pygame.mouse.get_pos()
-                        try:
-                            requests.post(f"{SERVER}/shoot", json={"player_id": player_id, "mx": mx, "my": my},
-                                          timeout=0.5)
-                        except Exception as e:
-                            print(f"Erreur shoot: {e}")
-
-        keys = pygame.key.get_pressed()
-
-        with lock:
-            if player_id not in pos_buffer or player_id not in players:
-                print("Joueur introuvable, déconnexion.")
-                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and script is None:  # clic gauche
+                shot = event.pos
+
+        read_messages(net)
+        if not running:
+            break
+        interpolate_positions(now)
+        received = time.perf_counter()
+
+        if player_id not in pos_buffer or player_id not in players:
+            # le thread réseau tente de reprendre la session ; on attend sa
+            # réponse ("joined" ou "lost") sans bloquer l'affichage
+            if not resuming:
+                net.request_resume()
+                resuming = True
+            pygame.display.flip()
+            continue
+        resuming = False
+
+        x, y = pos_buffer[player_id]
+
+        if script is not None:
+            # entrées rejouées (--entrees) : la partie s'arrête avec le fichier
+            frame = next(script, None)
+            if frame is None:
                 break
-            x, y = pos_buffer[player_id]
-            real_x = players[player_id]["x"]
-            real_y = players[player_id]["y"]
-
-        dx = dy = 0
-        moved = False
-        if keys[pygame.K_z] or keys[pygame.K_UP]:
-            dy -= SPEED * dt
-            moved = True
-        if keys[pygame.K_s] or keys[pygame.K_DOWN]:
-            dy += SPEED * dt
-            moved = True
-        if keys[pygame.K_q] or keys[pygame.K_LEFT]:
-            dx -= SPEED * dt
-            moved = True
-        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-            dx += SPEED * dt
-            moved = True
-
-        nx = max(0, min(WIDTH - PLAYER_SIZE, x + dx))
-        ny = max(0, min(HEIGHT - PLAYER_SIZE, y + dy))
-
-        if moved and (now - last_sent_time) > max(0.05, dt):
-            res = move(nx, ny)
-            if res and res.status_code == 200:
-                status = res.json().get("status")
-                if status == "ok":
-                    with lock:
-                        pos_buffer[player_id] = (nx, ny)
-            last_sent_time = now
+            ix, iy = frame.get("dx", 0), frame.get("dy", 0)
+            if "mx" in frame:
+                shot = (frame["mx"], frame["my"])
+        else:
+            keys = pygame.key.get_pressed()
+            ix = iy = 0
+            if keys[pygame.K_z] or keys[pygame.K_UP]:
+                iy -= 1
+            if keys[pygame.K_s] or keys[pygame.K_DOWN]:
+                iy += 1
+            if keys[pygame.K_q] or keys[pygame.K_LEFT]:
+                ix -= 1
+            if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+                ix += 1
+        if record is not None:
+            record.write(script_line(ix, iy, shot))
+
+        if shot is not None:
+            # le tir part dans le même lot que les déplacements, dans l'ordre
+            input_seq += 1
+            # lag : les autres joueurs sont affichés avec un ping, le retard
+            # d'interpolation et en moyenne un demi-tick réseau (attente du lot) de retard
+            lag = ping_ms / 1000 + snapshots.delay + NET_TICK / 2
+            net.send({"seq": input_seq, "t": now, "mx": shot[0], "my": shot[1], "lag": lag})
+
+        # chaque image déplacée devient une entrée datée, appliquée tout de
+        # suite ici et rejouée dans l'ordre par le serveur, à vitesse bornée
+        if (ix, iy) != (0, 0):
+            input_seq += 1
+            step = min(dt, MAX_INPUT_DT)  # le serveur borne aussi la durée d'une entrée
+            prediction.apply(input_seq, ix, iy, step, other_positions())
+            net.send({"seq": input_seq, "t": now, "dt": step, "dx": ix, "dy": iy})
+        nx, ny = prediction.x, prediction.y
+        pos_buffer[player_id] = (nx, ny)
 
         # Mise à jour positions balles
-        to_remove = []
-        with lock:
-            for i, b in enumerate(bullets):
-                b["x"] += b["vx"] * b["speed"] * dt
-                b["y"] += b["vy"] * b["speed"] * dt
-
-                # Vérifie si la balle est hors écran -> suppression
-                if b["x"] < 0 or b["x"] > WIDTH or b["y"] < 0 or b["y"] > HEIGHT:
-                    to_remove.append(i)
-                    continue
-
-                # Vérifie collisions avec joueurs (sauf tireur)
-                for pid, (px, py) in pos_buffer.items():
-                    if pid == b["shooter"]:
-                        continue
-                    # rectangle joueur
-                    rect_joueur = pygame.Rect(px, py, PLAYER_SIZE, PLAYER_SIZE)
-                    # rectangle balle
-                    rect_balle = pygame.Rect(b["x"] - BULLET_SIZE/2, b["y"] - BULLET_SIZE/2, BULLET_SIZE, BULLET_SIZE)
-                    if rect_joueur.colliderect(rect_balle):
-                        # supprime joueur touché (localement, il faudra gérer serveur si tu veux vrai suppression)
-                        if pid in players:
-                            del players[pid]
-                        if pid in pos_buffer:
-                            del pos_buffer[pid]
-                        to_remove.append(i)
-                        break  # une balle tue qu’un joueur à la fois
-
-            # Supprime balles mortes
-            for i in reversed(to_remove):
-                del bullets[i]
+        move_bullets(dt)
 
         dist = ((nx - x) ** 2 + (ny - y) ** 2) ** 0.5
         speed_sample = dist / dt if dt > 0 else 0
@@ -255,40 +306,36 @@ def main():
         if len(fps_history) > MAX_HISTORY:
             fps_history.pop(0)
         fps = sum(fps_history) / len(fps_history)
+        simulated = time.perf_counter()
+
+        renderer.begin()
+        for pid in list(pos_buffer.keys()):
+            if pid not in players:
+                del pos_buffer[pid]
+        renderer.forget(players)
+
+        for pid, (px, py) in pos_buffer.items():
+            if pid not in players:
+                continue
+            color = (0, 255, 0) if pid == player_id else (255, 0, 0)
+            renderer.player(pid, players[pid].get("name", f"J{pid}"), color, px, py)
+
+        # Dessine les balles
+        for b in bullets:
+            renderer.circle((255, 255, 0), (int(b["x"]), int(b["y"])), BULLET_SIZE // 2)
+
+        renderer.info(info_lines(len(players)))
+        renderer.end()
+
+        if timer is not None:
+            timer.frame(received - start, simulated - received, time.perf_counter() - simulated)
+        frames += 1
+        if args.images is not None and frames >= args.images:
+            break
 
-        screen.fill((30, 30, 30))
-        with lock:
-            for pid in list(pos_buffer.keys()):
-                if pid not in players:
-                    del pos_buffer[pid]
-
-            for pid, (px, py) in pos_buffer.items():
-                if pid not in players:
-                    continue
-                color = (0, 255, 0) if pid == player_id else (255, 0, 0)
-                pygame.draw.rect(screen, color, (px, py, PLAYER_SIZE, PLAYER_SIZE))
-                pygame.draw.rect(screen, (36, 46, 56), (px + 10, py + 10, 10, 10))
-                pygame.draw.rect(screen, (36, 46, 56), (px + 30, py + 10, 10, 10))
-                pygame.draw.rect(screen, (36, 46, 56), (px + 10, py + 30, 10, 10))
-                pygame.draw.rect(screen, (36, 46, 56), (px + 20, py + 30, 10, 10))
-                pygame.draw.rect(screen, (36, 46, 56), (px + 30, py + 30, 10, 10))
-                pygame.draw.rect(screen, (198, 198, 198), (px + 50, py + 30, 10, 10))
-                pygame.draw.rect(screen, (198, 198, 198), (px + 50, py + 20, 10, 10))
-                pygame.draw.rect(screen, (198, 198, 198), (px + 60, py + 20, 10, 10))
-                pseudo = players[pid].get("name", f"J{pid}")
-                label = font.render(pseudo, True, (255, 255, 255))
-                screen.blit(label, (px, py - 20))
-
-            # Dessine les balles
-            with lock:
-                for b in bullets:
-                    pygame.draw.circle(screen, (255, 255, 0), (int(b["x"]), int(b["y"])), BULLET_SIZE // 2)
-
-
-        draw_info_overlay(screen, font, len(players))
-        pygame.display.flip()
-
-    leave_game()
+    if record is not None:
+        record.close()
+    net.close()
     pygame.quit()
 
 
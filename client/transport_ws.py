@@ -0,0 +1,93 @@
+import json
+import struct
+import threading
+import time
+
+import simple_websocket
+
+from commun import protocole
+
+
+def ws_url(server, room=None, binary=False):
+    # https://hote/chemin -> wss://hote/chemin/ws?room=<salle>&fmt=bin
+    if server.startswith("https://"):
+        url = "wss://" + server[len("https://"):] + "/ws"
+    elif server.startswith("http://"):
+        url = "ws://" + server[len("http://"):] + "/ws"
+    else:
+        url = server + "/ws"
+    params = []
+    if room is not None:
+        params.append(f"room={room}")
+    if binary:
+        params.append("fmt=bin")
+    if params:
+        url += "?" + "&".join(params)
+    return url
+
+
+class WsTransport:
+    # Connexion persistante vers /ws : le serveur pousse l'état à chaque tick,
+    # on lui envoie ses entrées sur la même connexion (plus de polling HTTP).
+    # En binaire, l'état et les entrées passent en trames binaires, les
+    # messages de service (ping, resync) restent en JSON. Le jeton part
+    # dans l'en-tête Authorization comme en HTTP, pas dans l'URL (qui finit
+    # dans les journaux d'accès du serveur).
+
+    def __init__(self, server, on_message, room=None, binary=False, token=None):
+        self.url = ws_url(server, room, binary)
+        self.headers = {"Authorization": f"Bearer {token}"} if token is not None else None
+        self.binary = binary
+        self.on_message = on_message
+        self.ws = None
+        self.connected = False
+        self._send_lock = threading.Lock()
+
+    def connect(self):
+        self.ws = simple_websocket.Client.connect(self.url, headers=self.headers)
+        self.connected = True
+
+    def send(self, message):
+        if not self.connected:
+            return False
+        try:
+            if self.binary and message.get("type") in ("move", "shoot", "inputs"):
+                data = protocole.encode_input(message)
+            else:
+                data = json.dumps(message)
+            with self._send_lock:
+                self.ws.send(data)
+            return True
+        except Exception as e:
+            print(f"Erreur websocket send: {e}")
+            self.connected = False
+            return False
+
+    def ping(self):
+        return self.send({"type": "ping", "t": time.time()})
+
+    def receive_loop(self, is_running):
+        # bloque jusqu'à la fermeture ; chaque message JSON est passé à on_message
+        while self.connected and is_running():
+            try:
+                raw = self.ws.receive(timeout=1)
+            except simple_websocket.ConnectionClosed:
+                break
+            if raw is None:
+                continue
+            try:
+                if isinstance(raw, bytes):
+                    self.on_message(protocole.decode_message(raw))
+                else:
+                    self.on_message(json.loads(raw))
+            except (ValueError, struct.error) as e:
+                print(f"Erreur websocket message: {e}")
+        self.connected = False
+
+    def close(self):
+        self.connected = False
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
@@ -0,0 +1,10 @@
+# Outils de mesure partagés par les benchmarks et les tests de charge
+# (client/bots.py, client/bench_rendu.py, serveur/replay.py).
+
+
+def percentile(sorted_values, p):
+    # p-ième centile (0..100) d'une liste déjà triée, 0.0 si elle est vide
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[i]
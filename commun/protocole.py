@@ -0,0 +1,185 @@
+import struct
+
+# Encodage binaire optionnel, partagé par le serveur et les clients.
+# Négocié par type de contenu : le client envoie ses entrées avec
+# Content-Type: CONTENT_TYPE et demande l'état avec Accept: CONTENT_TYPE
+# (ou ?fmt=bin sur /ws). Sans ça tout reste en JSON.
+#
+# État (full ou diff), little-endian :
+#   en-tête   kind u8, version u32, since u32, temps de la simulation f64,
+#             vitesse des balles f32, nb joueurs, nb noms, nb partis,
+#             nb balles, nb balles supprimées (u16)
+#   joueur    pid u32, x f32, y f32, seq u32                    (16 octets)
+#   nom       pid u32, longueur u8, utf-8  -- seulement à l'arrivée du joueur
+#   parti     pid u32
+#   balle     id u32, tireur u32, x, y, vx, vy f32              (24 octets)
+#   supprimée id u32
+#
+# Entrées (une seule pour /move et /shoot, un lot pour /inputs) :
+#   en-tête   pid u32, nb entrées u16
+#   entrée    seq u32, dx i8, dy i8, flags u8, x f32, y f32, dt f32,
+#             t f64 (horodatage client), latence vue par le tireur
+#             u16 en ms                                          (30 octets)
+# Réponse à une entrée : kind u8, statut u8, seq u32
+#
+# Le premier octet (kind) distingue état et réponse sur le websocket.
+
+CONTENT_TYPE = "application/x-jeumulti"
+U16, U32 = 0xFFFF, 0xFFFFFFFF
+
+FULL, DIFF, ACK = 1, 2, 3
+INPUT_DIR, INPUT_FIRE, INPUT_TARGET, INPUT_DT = 1, 2, 4, 8
+
+STATUSES = ["ok", "unknown_player", "invalid_input", "full", "name_taken", "unknown_room", "unauthorized"]
+
+_HEADER = struct.Struct("<BIIdfHHHHH")
+_PLAYER = struct.Struct("<IffI")
+_NAME = struct.Struct("<IB")
+_ID = struct.Struct("<I")
+_BULLET = struct.Struct("<IIffff")
+_INPUTS = struct.Struct("<IH")
+_INPUT = struct.Struct("<IbbBxfffdH")
+_ACK = struct.Struct("<BBI")
+
+
+def encode_name(name):
+    # pseudo en utf-8, 255 octets au plus (longueur u8) sans couper un caractère
+    return name.encode()[:255].decode("utf-8", "ignore").encode()
+
+
+def encode_state(data):
+    # data : même dict que la version JSON (full_state() ou ChangeLog.diff()).
+    # Appelé dans le tick (Room.publish) : ne doit jamais lever. Les listes
+    # sont tronquées à U16 éléments et les entiers ramenés sur 32 bits.
+    players = list(data.get("players", {}).items())[:U16]
+    left = data.get("left", [])[:U16]
+    bullets = data.get("bullets", [])[:U16]
+    removed = data.get("removed", [])[:U16]
+    names = [(pid, encode_name(p["name"])) for pid, p in players if "name" in p]
+    speed = bullets[0]["speed"] if bullets else 0
+    kind = FULL if data.get("full") else DIFF
+
+    parts = [_HEADER.pack(kind, data["version"] & U32, data.get("since", 0) & U32, data.get("time", 0.0), speed,
+                          len(players), len(names), len(left), len(bullets), len(removed))]
+    for pid, p in players:
+        parts.append(_PLAYER.pack(int(pid) & U32, p["x"], p["y"], p.get("seq", 0) & U32))
+    for pid, name in names:
+        parts.append(_NAME.pack(int(pid) & U32, len(name)))
+        parts.append(name)
+    for pid in left:
+        parts.append(_ID.pack(int(pid) & U32))
+    for b in bullets:
+        parts.append(_BULLET.pack(b["id"] & U32, int(b["shooter"]) & U32, b["x"], b["y"], b["vx"], b["vy"]))
+    for bid in removed:
+        parts.append(_ID.pack(bid & U32))
+    return b"".join(parts)
+
+
+def decode_state(buf):
+    # renvoie le même dict que la version JSON, avec "type": "state"
+    kind, version, since, t, speed, n_players, n_names, n_left, n_bullets, n_removed = _HEADER.unpack_from(buf, 0)
+    offset = _HEADER.size
+    data = {"type": "state", "version": version, "time": t}
+    if kind == FULL:
+        data["full"] = True
+    else:
+        data["since"] = since
+
+    players = {}
+    for _ in range(n_players):
+        pid, x, y, seq = _PLAYER.unpack_from(buf, offset)
+        offset += _PLAYER.size
+        players[str(pid)] = {"x": x, "y": y, "seq": seq}
+    for _ in range(n_names):
+        pid, length = _NAME.unpack_from(buf, offset)
+        offset += _NAME.size
+        players[str(pid)]["name"] = buf[offset:offset + length].decode()
+        offset += length
+    left = []
+    for _ in range(n_left):
+        left.append(str(_ID.unpack_from(buf, offset)[0]))
+        offset += _ID.size
+    bullets = []
+    for _ in range(n_bullets):
+        bid, shooter, x, y, vx, vy = _BULLET.unpack_from(buf, offset)
+        offset += _BULLET.size
+        bullets.append({"x": x, "y": y, "vx": vx, "vy": vy, "speed": speed, "shooter": str(shooter), "id": bid})
+    removed = []
+    for _ in range(n_removed):
+        removed.append(_ID.unpack_from(buf, offset)[0])
+        offset += _ID.size
+
+    if players or kind == FULL:
+        data["players"] = players
+    if left:
+        data["left"] = left
+    if bullets or kind == FULL:
+        data["bullets"] = bullets
+    if removed:
+        data["removed"] = removed
+    return data
+
+
+def encode_input(data):
+    # data : même dict que le JSON de /move et /shoot, ou un lot de /inputs
+    # ({"player_id": .., "inputs": [...]})
+    inputs = data.get("inputs", [data])
+    parts = [_INPUTS.pack(int(data["player_id"]), len(inputs))]
+    for cmd in inputs:
+        flags, x, y = 0, 0.0, 0.0
+        dx = dy = 0
+        if "dx" in cmd or "dy" in cmd:
+            flags |= INPUT_DIR
+            dx, dy = int(cmd.get("dx", 0)), int(cmd.get("dy", 0))
+        elif "x" in cmd and "y" in cmd:
+            flags |= INPUT_TARGET
+            x, y = cmd["x"], cmd["y"]
+        if "mx" in cmd and "my" in cmd:
+            flags |= INPUT_FIRE
+            x, y = cmd["mx"], cmd["my"]
+        if "dt" in cmd:
+            flags |= INPUT_DT
+        parts.append(_INPUT.pack(cmd.get("seq", 0), dx, dy, flags, x, y, cmd.get("dt", 0.0), cmd.get("t", 0.0),
+                                  min(65535, int(cmd.get("lag", 0) * 1000))))
+    return b"".join(parts)
+
+
+def decode_input(buf):
+    # renvoie toujours la forme lot : {"player_id": .., "inputs": [...]}
+    pid, count = _INPUTS.unpack_from(buf, 0)
+    offset = _INPUTS.size
+    inputs = []
+    for _ in range(count):
+        seq, dx, dy, flags, x, y, dt, t, lag = _INPUT.unpack_from(buf, offset)
+        offset += _INPUT.size
+        cmd = {"seq": seq}
+        if flags & INPUT_DIR:
+            cmd["dx"], cmd["dy"] = dx, dy
+        if flags & INPUT_TARGET:
+            cmd["x"], cmd["y"] = x, y
+        if flags & INPUT_FIRE:
+            cmd["mx"], cmd["my"] = x, y
+        if flags & INPUT_DT:
+            cmd["dt"] = dt
+        if t:
+            cmd["t"] = t
+        if lag:
+            cmd["lag"] = lag / 1000
+        inputs.append(cmd)
+    return {"player_id": str(pid), "inputs": inputs}
+
+
+def encode_ack(status, seq):
+    return _ACK.pack(ACK, STATUSES.index(status), seq or 0)
+
+
+def decode_ack(buf):
+    _, status, seq = _ACK.unpack_from(buf, 0)
+    return {"type": "ack", "status": STATUSES[status], "seq": seq}
+
+
+def decode_message(buf):
+    # message binaire reçu sur le websocket : état (full/diff) ou réponse
+    if buf[0] == ACK:
+        return decode_ack(buf)
+    return decode_state(buf)
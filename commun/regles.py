@@ -0,0 +1,33 @@
+# Règles du déplacement, partagées par le serveur (simulation qui fait
+# foi, serveur/simulation.py) et le client (prédiction de son propre
+# joueur) : pour les mêmes entrées et les mêmes autres joueurs, les deux
+# doivent arriver exactement à la même position.
+
+WIDTH, HEIGHT = 640, 480
+PLAYER_SIZE = 50
+SPEED = 300  # pixels par seconde
+MAX_INPUT_DT = 0.1  # durée max d'une entrée datée (image du client qui a ramé)
+BOUNDS = (WIDTH - PLAYER_SIZE, HEIGHT - PLAYER_SIZE)  # coin haut-gauche max d'un joueur
+
+
+def overlaps(x, y, ox, oy):
+    # deux joueurs (carrés de PLAYER_SIZE, repérés par leur coin haut-gauche) se chevauchent
+    return abs(x - ox) < PLAYER_SIZE and abs(y - oy) < PLAYER_SIZE
+
+
+def timed_target(x, y, dx, dy, dt):
+    # position visée par une entrée datée : direction (dx, dy) tenue dt secondes
+    step = SPEED * dt
+    return x + dx * step, y + dy * step
+
+
+def try_move(x, y, nx, ny, collides, bounds=BOUNDS):
+    # déplacement de (x, y) vers (nx, ny), borné au monde ; refusé si la
+    # nouvelle position chevauche un autre joueur (collides(nx, ny)).
+    # Renvoie la position obtenue, (x, y) si le joueur ne bouge pas.
+    max_x, max_y = bounds
+    nx = max(0, min(max_x, nx))
+    ny = max(0, min(max_y, ny))
+    if (nx, ny) == (x, y) or collides(nx, ny):
+        return x, y
+    return nx, ny
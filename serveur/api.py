@@ -0,0 +1,97 @@
+from flask import Flask, Response, g, request
+from flask_cors import CORS
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+import struct
+import threading
+import time
+
+import metrics
+from backend import LocalBackend
+from service import GameService, bearer_token
+from ticker import TickScheduler
+
+
+def create_app(lobby=None, shooting=False, backend=None):
+    # routes HTTP + websocket communes à main.py, beta.py et workers.py ;
+    # chaque requête ne touche que la salle du joueur (ou celle passée en
+    # ?room=). Le contrat lui-même est dans service.py.
+    app = Flask(__name__)
+    CORS(app)
+    sock = Sock(app)
+    service = GameService(backend if backend is not None else LocalBackend(lobby), shooting)
+
+    @app.before_request
+    def start_timer():
+        g.start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        route = request.url_rule.rule if request.url_rule is not None else "inconnue"
+        metrics.REQUESTS.labels(route, request.method, response.status_code).inc()
+        metrics.REQUEST_DURATION.labels(route).observe(time.perf_counter() - g.start)
+        return response
+
+    def request_token():
+        return bearer_token(request.headers.get("Authorization"), request.args.get("token"))
+
+    def respond(result):
+        code, mimetype, body = result
+        return Response(body, status=code, mimetype=mimetype)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_page():
+        return respond(service.metrics())
+
+    @app.route("/join", methods=["POST"])
+    def join():
+        return respond(service.join(request.get_json()))
+
+    @app.route("/resume", methods=["POST"])
+    def resume():
+        return respond(service.resume(request_token()))
+
+    def input_request():
+        return respond(service.inputs(request_token(), request.content_type, request.get_data()))
+
+    # /move, /inputs (lot d'entrées accumulées depuis le dernier tick réseau) et /shoot
+    for route in service.input_routes():
+        app.add_url_rule(route, route[1:], input_request, methods=["POST"])
+
+    @app.route("/state", methods=["GET"])
+    def state():
+        return respond(service.state(request_token(), request.args.get("room"),
+                                     request.args.get("since", type=int), request.headers.get("Accept"),
+                                     request.args.get("view")))
+
+    @sock.route("/ws")
+    def ws_session(ws):
+        # le client envoie ses entrées, le serveur pousse l'état à chaque tick
+        # ?fmt=bin : état poussé et entrées en binaire (commun/protocole.py)
+        # ?view= : seulement les entités de cette zone (interest.py)
+        fmt = request.args.get("fmt", "json")
+        room, session, view = service.ws_open(request_token(), request.args.get("room"), fmt,
+                                              request.args.get("view"))
+        if room is None:
+            return
+        room.broadcaster.subscribe(ws, fmt, view)
+        room.broadcaster.send(ws, service.ws_state(room, fmt, view))
+        try:
+            while True:
+                reply = service.ws_message(ws.receive(), room, session, fmt, view)
+                if reply is not None:
+                    room.broadcaster.send(ws, reply)
+        except (ConnectionClosed, ValueError, KeyError, TypeError, struct.error):
+            pass
+        finally:
+            room.broadcaster.unsubscribe(ws)
+
+    @app.route("/leave", methods=["POST"])
+    def leave():
+        return respond(service.leave(request_token()))
+
+    return app
+
+
+def start_simulation(lobby):
+    threading.Thread(target=TickScheduler(lobby.step_all).run, daemon=True).start()
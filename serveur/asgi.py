@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+from urllib.parse import parse_qs
+
+# commun/ (protocole partagé avec le client) est à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import metrics
+from backend import LocalBackend
+from push import QueueBroadcaster
+from room import Lobby, Room
+from service import GameService, bearer_token
+from ticker import TickScheduler
+
+# Même API que main.py / beta.py, servie par une application ASGI sans
+# framework : une seule boucle d'événements, pas de thread par requête.
+# Le tick est une tâche de la boucle et les handlers sont du code
+# synchrone entre deux await : les verrous des salles ne sont jamais
+# disputés. Les connexions keep-alive ou websocket ne coûtent qu'une
+# coroutine chacune.
+#
+#   python asgi.py            salles de base (main.py)
+#   python asgi.py --beta     salles avec tir (beta.py)
+#   uvicorn asgi:app          idem, JEUMULTI_BETA=1 pour le tir
+#   JEUMULTI_RECORD=dossier   enregistre chaque partie (replay.py)
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"authorization, content-type, accept"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+]
+
+
+class HttpRequest:
+    __slots__ = ("method", "path", "args", "headers", "body")
+
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = {k: v[0] for k, v in parse_qs(scope["query_string"].decode()).items()}
+        self.headers = {k.decode().lower(): v.decode() for k, v in scope["headers"]}
+        self.body = body
+
+    def token(self):
+        return bearer_token(self.headers.get("authorization"), self.args.get("token"))
+
+
+def int_arg(value):
+    # comme request.args.get(..., type=int) de Flask : None si absent ou invalide
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def create_asgi_app(lobby, shooting=False):
+    service = GameService(LocalBackend(lobby), shooting)
+
+    def join(req):
+        try:
+            data = json.loads(req.body)
+        except ValueError:
+            return 400, "application/json", json.dumps({"status": "invalid_request"})
+        return service.join(data)
+
+    def inputs(req):
+        return service.inputs(req.token(), req.headers.get("content-type"), req.body)
+
+    routes = {
+        ("GET", "/metrics"): lambda req: service.metrics(),
+        ("POST", "/join"): join,
+        ("POST", "/resume"): lambda req: service.resume(req.token()),
+        ("GET", "/state"): lambda req: service.state(req.token(), req.args.get("room"),
+                                                     int_arg(req.args.get("since")), req.headers.get("accept"),
+                                                     req.args.get("view")),
+        ("POST", "/leave"): lambda req: service.leave(req.token()),
+    }
+    for route in service.input_routes():
+        routes["POST", route] = inputs
+
+    async def http(scope, receive, send):
+        start = time.perf_counter()
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        req = HttpRequest(scope, b"".join(chunks))
+
+        handler = routes.get((req.method, req.path))
+        if req.method == "OPTIONS":
+            code, mimetype, body = 200, None, ""
+        elif handler is None:
+            code, mimetype, body = 404, "application/json", json.dumps({"status": "not_found"})
+        else:
+            code, mimetype, body = handler(req)
+
+        headers = list(CORS_HEADERS)
+        if mimetype is not None:
+            headers.append((b"content-type", mimetype.encode()))
+        if isinstance(body, str):
+            body = body.encode()
+        await send({"type": "http.response.start", "status": code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+        route = req.path if handler is not None else "inconnue"
+        metrics.REQUESTS.labels(route, req.method, code).inc()
+        metrics.REQUEST_DURATION.labels(route).observe(time.perf_counter() - start)
+
+    async def pump(queue, send):
+        # envoie les messages déposés par QueueBroadcaster ; None : fermeture
+        while True:
+            message = await queue.get()
+            if message is None:
+                await send({"type": "websocket.close"})
+                return
+            if isinstance(message, bytes):
+                await send({"type": "websocket.send", "bytes": message})
+            else:
+                await send({"type": "websocket.send", "text": message})
+
+    async def websocket(scope, receive, send):
+        # le client envoie ses entrées, le serveur pousse l'état à chaque tick
+        # ?fmt=bin : état poussé et entrées en binaire (commun/protocole.py)
+        # ?view= : seulement les entités de cette zone (interest.py)
+        await receive()  # websocket.connect
+        req = HttpRequest({**scope, "method": "GET"}, b"")
+        fmt = req.args.get("fmt", "json")
+        room, session, view = service.ws_open(req.token(), req.args.get("room"), fmt, req.args.get("view"))
+        if room is None:
+            await send({"type": "websocket.close"})
+            return
+        await send({"type": "websocket.accept"})
+
+        conn = object()  # clé de la connexion chez le broadcaster
+        queue = room.broadcaster.subscribe(conn, fmt, view)
+        room.broadcaster.send(conn, service.ws_state(room, fmt, view))
+        sender = asyncio.create_task(pump(queue, send))
+        try:
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                raw = message.get("bytes")
+                if raw is None:
+                    raw = message.get("text")
+                reply = service.ws_message(raw, room, session, fmt, view)
+                if reply is not None:
+                    room.broadcaster.send(conn, reply)
+        except (ValueError, KeyError, TypeError, struct.error):
+            pass
+        finally:
+            room.broadcaster.unsubscribe(conn)
+            sender.cancel()
+
+    async def lifespan(receive, send):
+        task = None
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                task = asyncio.create_task(TickScheduler(lobby.step_all).run_async())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if task is not None:
+                    task.cancel()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def app(scope, receive, send):
+        if scope["type"] == "http":
+            await http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await websocket(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await lifespan(receive, send)
+
+    return app
+
+
+def make_lobby(beta):
+    if beta:
+        from combat import BattleRoom
+        return Lobby(BattleRoom, QueueBroadcaster, os.environ.get("JEUMULTI_RECORD"))
+    return Lobby(Room, QueueBroadcaster, os.environ.get("JEUMULTI_RECORD"))
+
+
+BETA = "--beta" in sys.argv[1:] or os.environ.get("JEUMULTI_BETA") == "1"
+lobby = make_lobby(BETA)
+app = create_asgi_app(lobby, shooting=BETA)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=6789)
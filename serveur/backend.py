@@ -0,0 +1,186 @@
+from interest import parse_view
+from shared import ON_MASTER
+
+# Où vit l'état du jeu, vu par service.py. Les méthodes renvoient des
+# tuples simples (picklables) pour pouvoir passer d'un processus à l'autre :
+#   join / resume   (status, code http, réponse de /join ou None)
+#   enqueue         (status, code http, dernier seq traité)
+#   state           (status, code http, corps encodé ; None si rien de neuf)
+#   leave           (status, code http)
+
+
+MAX_CACHED_TOKENS = 4096
+
+
+class LocalBackend:
+    # L'état est le Lobby de ce processus, qui fait aussi tourner le tick
+    # (main.py, beta.py, asgi.py, et le processus maître de workers.py).
+
+    def __init__(self, lobby):
+        self.lobby = lobby
+
+    def _joined(self, room, session):
+        # copie sous le verrou : la réponse est encodée après l'avoir rendu
+        with room.lock:
+            players = {pid: dict(p) for pid, p in room.players.items()}
+        return {"status": "ok", "player_id": session.pid, "token": session.token,
+                "room": room.id, "players": players}
+
+    def join(self, name, room_id=None):
+        if name is None:
+            name = f"J{self.lobby.next_id}"
+        status, code, room, session = self.lobby.join(name, room_id)
+        if status != "ok":
+            return status, code, None
+        return status, code, self._joined(room, session)
+
+    def resume(self, token):
+        # reconnexion avec le jeton, sans repasser par /join
+        session = self.lobby.sessions.get(token)
+        if session is None:
+            return "unauthorized", 401, None
+        status, code, room, session = self.lobby.resume(session)
+        if status != "ok":
+            return status, code, None
+        return status, code, self._joined(room, session)
+
+    def enqueue(self, token, data):
+        # une entrée seule (/move, /shoot) ou un lot {"player_id", "inputs": [...]} ;
+        # le joueur est celui du jeton, un player_id différent est refusé
+        session = self.lobby.sessions.get(token)
+        if session is None:
+            return "unauthorized", 401, None
+        try:
+            pid = str(data.get("player_id", session.pid))
+            inputs = data.get("inputs", [data])
+        except (AttributeError, TypeError):
+            return "invalid_input", 400, None
+        if pid != session.pid:
+            return "unauthorized", 401, None
+        room = self.lobby.room_of(pid)
+        if room is None:
+            return "unknown_player", 400, None
+        return room.enqueue_inputs(pid, inputs)
+
+    def room_for(self, token, room_id=None):
+        # (salle, status, code) : salle du joueur si un jeton est fourni (il
+        # doit être valide), sinon celle de ?room= (spectateurs, anciens clients)
+        if token is None:
+            return self.lobby.room(room_id), "unknown_room", 404
+        session = self.lobby.sessions.get(token)
+        if session is None:
+            return None, "unauthorized", 401
+        return self.lobby.room_of(session.pid), "unknown_player", 404
+
+    def room_id_for(self, token):
+        room, status, code = self.room_for(token)
+        return (room.id if room is not None else None), status, code
+
+    def state(self, token, room_id, since, fmt, view=None):
+        # view : ?view= (interest.py), seulement les entités de la zone
+        room, status, code = self.room_for(token, room_id)
+        if room is None:
+            return status, code, None
+        if view is None:
+            body = room.encoded_state(since, fmt)
+        else:
+            session = self.lobby.sessions.get(token)
+            try:
+                view = parse_view(view, session.pid if session is not None else None)
+            except ValueError:
+                return "invalid_view", 400, None
+            body = room.encoded_view(view, since, fmt)
+        return "ok", 200 if body is not None else 304, body
+
+    def leave(self, token):
+        session = self.lobby.sessions.get(token)
+        if session is None:
+            return "unauthorized", 401
+        self.lobby.leave(session)
+        return "left", 200
+
+    def counts(self):
+        # (salles, joueurs, balles) pour /metrics
+        rooms = list(self.lobby.rooms.values())
+        return (len(rooms), sum(len(room.players) for room in rooms),
+                sum(len(getattr(room, "bullets", ())) for room in rooms))
+
+    def stream(self, token, room_id, fmt, view=None):
+        # (salle, session, vue) pour une connexion websocket ; sans jeton elle
+        # ne peut que regarder
+        room, _, _ = self.room_for(token, room_id)
+        if room is None or fmt not in room.snapshot.full:
+            return None, None, None
+        session = self.lobby.sessions.get(token)
+        try:
+            view = parse_view(view, session.pid if session is not None else None)
+        except ValueError:
+            return None, None, None
+        return room, session, view
+
+
+class SharedBackend:
+    # Vu d'un processus HTTP de workers.py : l'état appartient au processus
+    # maître. Les lectures de /state se font dans la mémoire partagée
+    # (shared.SnapshotStore) sans aller-retour ; les arrivées, départs et
+    # entrées sont des appels au maître (shared.CommandClient), qui
+    # valide le jeton.
+
+    def __init__(self, commands, snapshots):
+        self.commands = commands
+        self.snapshots = snapshots
+        # {jeton: salle}, pour /state sans appel au maître ; propre à ce
+        # processus, un /leave servi par un autre worker ne l'efface pas (l'état
+        # d'une salle est de toute façon lisible par les spectateurs)
+        self._token_rooms = {}
+
+    def join(self, name, room_id=None):
+        return self.commands.call("join", name, room_id)
+
+    def resume(self, token):
+        result = self.commands.call("resume", token)
+        self._token_rooms.pop(token, None)  # la salle a pu changer
+        return result
+
+    def enqueue(self, token, data):
+        return self.commands.call("enqueue", token, data)
+
+    def state(self, token, room_id, since, fmt, view=None):
+        # la mémoire partagée ne contient que l'état complet et ses diffs :
+        # pas de filtrage par zone ici, ?view= est ignoré (sauf pour une
+        # salle servie par le maître)
+        if token is not None:
+            room_id = self._token_rooms.get(token)
+            if room_id is None:
+                room_id, status, code = self.commands.call("room_id_for", token)
+                if room_id is None:
+                    return status, code, None
+                if len(self._token_rooms) >= MAX_CACHED_TOKENS:
+                    self._token_rooms.clear()
+                self._token_rooms[token] = room_id
+        elif room_id is None:
+            room_id = self.snapshots.first_room()
+        found, body = self.snapshots.read(room_id, since, fmt)
+        if found == ON_MASTER:
+            # salle trop grosse pour sa case : état encodé par le maître
+            return self.commands.call("state", token, room_id, since, fmt, view)
+        if not found:
+            if token is not None:
+                # salle créée par un /join pas encore recopiée par le tick (ou
+                # fermée depuis) : on redemandera au maître la prochaine fois
+                self._token_rooms.pop(token, None)
+                return "ok", 304, None
+            return "unknown_room", 404, None
+        return "ok", 200 if body is not None else 304, body
+
+    def leave(self, token):
+        self._token_rooms.pop(token, None)
+        return self.commands.call("leave", token)
+
+    def counts(self):
+        return self.commands.call("counts")
+
+    def stream(self, token, room_id, fmt, view=None):
+        # pas de push websocket hors du maître : les clients repassent au polling
+        return None, None, None
+
@@ -0,0 +1,128 @@
+import numpy as np
+
+
+class BulletStore:
+    # Balles en struct-of-arrays : un tableau NumPy par champ, les `count`
+    # premières cases sont vivantes. Déplacement, sortie d'écran et tests
+    # de collision se font en une opération vectorisée pour toutes les balles,
+    # et les suppressions bouchent les trous avec les dernières balles
+    # (swap-remove) au lieu de décaler toute la liste.
+
+    def __init__(self, capacity=256):
+        self.count = 0
+        self.next_id = 1
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.shooter = np.zeros(capacity, dtype=np.int64)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.rewind = np.zeros(capacity, dtype=np.int64)  # ticks de latence du tireur
+
+    def _columns(self):
+        return (self.x, self.y, self.vx, self.vy, self.shooter, self.ids, self.rewind)
+
+    def _grow(self):
+        n = self.count
+        old = self._columns()
+        self._alloc(2 * len(self.x))
+        for new, src in zip(self._columns(), old):
+            new[:n] = src[:n]
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x, y, vx, vy, shooter, rewind=0):
+        if self.count == len(self.x):
+            self._grow()
+        i = self.count
+        self.x[i], self.y[i] = x, y
+        self.vx[i], self.vy[i] = vx, vy
+        self.shooter[i] = shooter
+        self.rewind[i] = rewind
+        self.ids[i] = self.next_id
+        self.next_id += 1
+        self.count += 1
+        return int(self.ids[i])
+
+    def step(self, distance):
+        n = self.count
+        self.x[:n] += self.vx[:n] * distance
+        self.y[:n] += self.vy[:n] * distance
+
+    def out_of_bounds(self, width, height):
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        return (x < 0) | (x > width) | (y < 0) | (y > height)
+
+    def swept_bounds(self, distance):
+        # (x0, y0, x1, y1) englobant le dernier déplacement de toutes les balles
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        sx, sy = x - self.vx[:n] * distance, y - self.vy[:n] * distance
+        return (float(min(x.min(), sx.min())), float(min(y.min(), sy.min())),
+                float(max(x.max(), sx.max())), float(max(y.max(), sy.max())))
+
+    def sweep(self, px, py, player_size, bullet_size, player, distance):
+        # collision balayée : fraction (0..1) du dernier déplacement de chaque
+        # balle à laquelle son centre entre dans la boîte du joueur élargie de
+        # la demi-taille d'une balle (segment contre AABB, méthode des slabs) ;
+        # inf si elle ne la croise pas ou si c'est une balle du joueur.
+        # Rien ne traverse un joueur, quelle que soit la longueur d'un tick.
+        # px, py : position du joueur, ou une position par balle (tableaux)
+        n = self.count
+        margin = bullet_size / 2
+        entry = np.zeros(n)
+        leave = np.ones(n)
+        for pos, vel, lo in ((self.x[:n], self.vx[:n], px), (self.y[:n], self.vy[:n], py)):
+            start = pos - vel * distance
+            move = vel * distance
+            lo = lo - margin
+            hi = lo + player_size + 2 * margin
+            still = move == 0
+            safe = np.where(still, 1.0, move)
+            t1 = (lo - start) / safe
+            t2 = (hi - start) / safe
+            # déplacement nul sur cet axe : dedans tout le tick, ou jamais
+            inside = (start >= lo) & (start <= hi)
+            near = np.where(still, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2))
+            far = np.where(still, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2))
+            entry = np.maximum(entry, near)
+            leave = np.minimum(leave, far)
+        hit = (entry <= leave) & (self.shooter[:n] != player)
+        return np.where(hit, entry, np.inf)
+
+    def remove(self, dead):
+        # swap-remove vectorisé : les trous avant la nouvelle fin sont bouchés
+        # par les balles vivantes situées après ; renvoie les ids supprimés
+        n = self.count
+        removed = self.ids[:n][dead].tolist()
+        if not removed:
+            return removed
+        keep = n - len(removed)
+        holes = np.flatnonzero(dead[:keep])
+        movers = keep + np.flatnonzero(~dead[keep:])
+        for arr in self._columns():
+            arr[holes] = arr[movers]
+        self.count = keep
+        return removed
+
+    def inside(self, x0, y0, x1, y1):
+        # masque des balles dans [x0, x1[ x [y0, y1[
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        return (x >= x0) & (x < x1) & (y >= y0) & (y < y1)
+
+    def to_list(self, speed, mask=None):
+        # mask : seulement les balles sélectionnées (zone d'intérêt)
+        n = self.count
+        columns = [c[:n] for c in (self.x, self.y, self.vx, self.vy, self.shooter, self.ids)]
+        if mask is not None:
+            columns = [c[mask] for c in columns]
+        return [
+            {"x": x, "y": y, "vx": vx, "vy": vy, "speed": speed, "shooter": str(shooter), "id": bid}
+            for x, y, vx, vy, shooter, bid in zip(*(c.tolist() for c in columns))
+        ]
@@ -0,0 +1,145 @@
+import math
+
+import numpy as np
+
+from bullets import BulletStore
+from commun.regles import SPEED
+from history import PositionHistory
+from interest import AOI_CELL
+from room import Room, PLAYER_SIZE, WIDTH, HEIGHT
+from service import TICK
+from simulation import MAX_INPUT_BUDGET
+
+BULLET_SPEED = 500
+BULLET_SIZE = 10
+# latence max compensée (s) ; fixe la taille de l'historique. Le client
+# envoie ping + retard d'interpolation (0.1 s) + attente du lot (~0.025 s) :
+# 0.5 s couvre un ping jusqu'à ~375 ms
+MAX_REWIND = 0.5
+HISTORY_TICKS = int(MAX_REWIND / TICK) + 1
+
+
+class BattleRoom(Room):
+    # Salle avec tir : les balles de la salle avancent dans le même tick
+    # que les joueurs, sous le verrou de la salle.
+
+    def __init__(self, room_id, on_leave=None, broadcaster=None):
+        self.bullets = BulletStore()
+        self.history = PositionHistory(HISTORY_TICKS)
+        super().__init__(room_id, on_leave, broadcaster)
+
+    def fire(self, pid, mx, my, lag=0.0):
+        # appelé par la simulation, verrou déjà pris ; `lag` : retard de ce que
+        # le tireur voyait, la balle touchera les joueurs là où il les voyait
+        px, py = self.players[pid]["x"], self.players[pid]["y"]
+        dx = mx - (px + PLAYER_SIZE / 2)
+        dy = my - (py + PLAYER_SIZE / 2)
+        # visée très lointaine (1e308) : on réduit avant hypot, qui donnerait inf
+        scale = max(abs(dx), abs(dy))
+        if scale > 1:
+            dx, dy = dx / scale, dy / scale
+        dist = math.hypot(dx, dy)
+        if dist == 0:
+            dist = 1
+        vx = dx / dist
+        vy = dy / dist
+        x, y = px + PLAYER_SIZE / 2, py + PLAYER_SIZE / 2
+        # lag fini (parse_input), borné à la fenêtre de l'historique avant la division
+        rewind = min(HISTORY_TICKS - 1, round(min(lag, MAX_REWIND) / TICK))
+        bid = self.bullets.spawn(x, y, vx, vy, int(pid), rewind)
+        # trajectoire rectiligne : le diff recalcule la position à partir du tick de tir
+        self.changelog.record("bullet", bid, {"x": x, "y": y, "vx": vx, "vy": vy, "shooter": pid, "id": bid, "tick": self.tick})
+
+    def bullet_view(self, spawn):
+        # position courante d'une balle tirée au tick spawn["tick"] (avancée dans ce même tick)
+        dist = BULLET_SPEED * TICK * (self.tick - spawn["tick"] + 1)
+        return {
+            "x": spawn["x"] + spawn["vx"] * dist,
+            "y": spawn["y"] + spawn["vy"] * dist,
+            "vx": spawn["vx"],
+            "vy": spawn["vy"],
+            "speed": BULLET_SPEED,
+            "shooter": spawn["shooter"],
+            "id": spawn["id"]
+        }
+
+    def rewound_position(self, pid, p, rewind, frames):
+        # position du joueur vue par le tireur de chaque balle ; un scalaire
+        # quand aucune balle n'est compensée (cas sans latence)
+        if len(frames) == 1 and 0 in frames:
+            return p["x"], p["y"]
+        px = np.full(len(rewind), float(p["x"]))
+        py = np.full(len(rewind), float(p["y"]))
+        for ticks, frame in frames.items():
+            if ticks and frame is not None and pid in frame:
+                sel = rewind == ticks
+                px[sel], py[sel] = frame[pid]
+        return px, py
+
+    def targets(self, distance, max_rewind):
+        # joueurs que les balles peuvent toucher pendant ce tick : la grille
+        # (coins haut-gauche, positions actuelles) est interrogée sur la boîte
+        # des trajets de toutes les balles, élargie de la taille d'un joueur et
+        # de ce qu'un joueur a pu parcourir depuis la position vue par le tireur
+        # le plus en retard. Dans l'ordre de self.players (replay.py à l'identique).
+        x0, y0, x1, y1 = self.bullets.swept_bounds(distance)
+        margin = BULLET_SIZE / 2
+        if max_rewind:
+            margin += SPEED * (max_rewind * TICK + MAX_INPUT_BUDGET)
+        near = set(self.grid.query(x0 - PLAYER_SIZE - margin, y0 - PLAYER_SIZE - margin, x1 + margin, y1 + margin))
+        return [pid for pid in self.players if pid in near]
+
+    def update(self, dt):
+        self.history.record(self.tick, self.players)
+        bullets = self.bullets
+        if not len(bullets):
+            return
+        bullets.step(BULLET_SPEED * dt)
+
+        # hors limites
+        dead = bullets.out_of_bounds(WIDTH, HEIGHT)
+
+        # positions passées, une lecture O(1) par latence distincte
+        rewind = bullets.rewind[:len(bullets)]
+        frames = {ticks: self.history.at(self.tick - ticks) for ticks in np.unique(rewind).tolist()}
+
+        # collision avec joueur (sauf tireur) : trajet de chaque balle pendant ce
+        # tick contre chaque joueur proche, en un test vectorisé par joueur. Une
+        # balle touche le premier joueur sur son trajet (même si elle sort
+        # ensuite de l'écran) et ne tue qu'un joueur.
+        pids = self.targets(BULLET_SPEED * dt, int(rewind.max()))
+        if pids:
+            entry = np.stack([
+                bullets.sweep(*self.rewound_position(pid, self.players[pid], rewind, frames),
+                              PLAYER_SIZE, BULLET_SIZE, int(pid), BULLET_SPEED * dt)
+                for pid in pids
+            ])
+            first = entry.argmin(axis=0)
+            hit = np.isfinite(entry.min(axis=0))
+            for k, pid in enumerate(pids):
+                mine = hit & (first == k)
+                if mine.any():
+                    # la balle arrivée la première sur ce joueur
+                    dead[np.argmin(np.where(mine, entry[k], np.inf))] = True
+                    # supprime joueur touché
+                    self.remove_player(pid, "killed")
+
+        for bid in bullets.remove(dead):
+            self.changelog.record("bullet_removed", bid)
+
+    def legacy_state(self):
+        # renvoyer aussi la liste des balles
+        return {"players": self.players, "bullets": self.bullets.to_list(BULLET_SPEED)}
+
+    def full_state(self):
+        state = super().full_state()
+        state["bullets"] = self.bullets.to_list(BULLET_SPEED)
+        return state
+
+    def view_state(self, cells):
+        # balles : simple test vectorisé du rectangle des cellules
+        state = super().view_state(cells)
+        cx0, cy0, cx1, cy1 = cells
+        state["bullets"] = self.bullets.to_list(BULLET_SPEED, self.bullets.inside(
+            cx0 * AOI_CELL, cy0 * AOI_CELL, (cx1 + 1) * AOI_CELL, (cy1 + 1) * AOI_CELL))
+        return state
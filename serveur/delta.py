@@ -0,0 +1,79 @@
+from collections import deque
+from itertools import islice
+
+
+class ChangeLog:
+    # Version d'état croissante + historique court des changements.
+    # Chaque changement incrémente la version ; /state?since=<v> ne renvoie
+    # que ce qui a bougé depuis v au lieu de tout l'état.
+    #
+    # Types de changements :
+    #   "join" / "move" / "leave"  -> clé = pid (valeur lue dans players au moment du diff)
+    #   "bullet"                   -> clé = id de balle, valeur = la balle (passée à
+    #                                 bullet_view au moment du diff si fourni)
+    #   "bullet_removed"           -> clé = id de balle
+
+    def __init__(self, max_entries=512):
+        self.version = 0
+        self._entries = deque(maxlen=max_entries)  # (version, kind, key, value)
+
+    def record(self, kind, key, value=None):
+        self.version += 1
+        self._entries.append((self.version, kind, key, value))
+
+    def covers(self, since):
+        # l'historique contient-il tous les changements après `since` ?
+        if since < 0 or since > self.version:
+            return False
+        if since == self.version:
+            return True
+        return bool(self._entries) and self._entries[0][0] <= since + 1
+
+    def diff(self, since, players, bullet_view=None):
+        # à appeler sous le verrou du jeu ; None si l'historique ne remonte
+        # pas assez loin (le client doit recharger l'état complet)
+        if not self.covers(since):
+            return None
+        joined, moved, left = set(), set(), set()
+        added, removed = {}, set()
+        start = len(self._entries) - (self.version - since)
+        for _, kind, key, value in islice(self._entries, start, None):
+            if kind == "join":
+                joined.add(key)
+                left.discard(key)
+            elif kind == "move":
+                moved.add(key)
+            elif kind == "leave":
+                joined.discard(key)
+                moved.discard(key)
+                left.add(key)
+            elif kind == "bullet":
+                added[key] = value
+            elif kind == "bullet_removed":
+                if added.pop(key, None) is None:
+                    removed.add(key)
+
+        changed = {}
+        for pid in joined:
+            if pid in players:
+                changed[pid] = players[pid]
+        for pid in moved - joined:
+            if pid in players:
+                p = players[pid]
+                changed[pid] = {"x": p["x"], "y": p["y"]}
+                if "seq" in p:
+                    changed[pid]["seq"] = p["seq"]
+
+        diff = {"since": since, "version": self.version}
+        if changed:
+            diff["players"] = changed
+        if left:
+            diff["left"] = sorted(left)
+        if added:
+            if bullet_view is None:
+                diff["bullets"] = list(added.values())
+            else:
+                diff["bullets"] = [bullet_view(b) for b in added.values()]
+        if removed:
+            diff["removed"] = sorted(removed)
+        return diff
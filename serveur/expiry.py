@@ -0,0 +1,32 @@
+import heapq
+
+
+class IdleReaper:
+    # Échéances d'inactivité dans un tas : à chaque tick on ne regarde que
+    # le sommet, jamais tous les joueurs. Une entrée n'est pas mise à jour
+    # quand le joueur agit ; à son échéance on relit sa dernière activité et
+    # on la repousse s'il a bougé entre-temps (suppression paresseuse).
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._heap = []  # [(échéance, clé)]
+
+    def __len__(self):
+        return len(self._heap)
+
+    def track(self, key, last_seen):
+        heapq.heappush(self._heap, (last_seen + self.timeout, key))
+
+    def expired(self, now, last_seen_of):
+        # clés inactives depuis plus de `timeout` ; last_seen_of(clé) renvoie
+        # sa dernière activité, ou None si elle a déjà disparu
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, key = heapq.heappop(heap)
+            last_seen = last_seen_of(key)
+            if last_seen is None:
+                continue
+            if last_seen + self.timeout <= now:
+                yield key
+            else:
+                heapq.heappush(heap, (last_seen + self.timeout, key))
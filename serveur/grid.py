@@ -0,0 +1,58 @@
+class SpatialGrid:
+    # Grille uniforme pour les tests de collision : chaque entité est rangée
+    # dans la cellule de son coin haut-gauche. Avec des cellules de la taille
+    # d'un joueur, un test ne regarde que les 3x3 cellules autour au lieu de
+    # tous les joueurs. Mise à jour incrémentale à chaque join/move/leave/kill.
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self._cells = {}  # {(cx, cy): set(ids)}
+        self._where = {}  # {id: (cx, cy)}
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def insert(self, key, x, y):
+        # sert aussi de move : ne touche aux cellules que si on en change
+        cell = self._cell(x, y)
+        old = self._where.get(key)
+        if old == cell:
+            return
+        if old is not None:
+            self._discard(key, old)
+        self._cells.setdefault(cell, set()).add(key)
+        self._where[key] = cell
+
+    def remove(self, key):
+        old = self._where.pop(key, None)
+        if old is not None:
+            self._discard(key, old)
+
+    def _discard(self, key, cell):
+        members = self._cells[cell]
+        members.discard(key)
+        if not members:
+            del self._cells[cell]
+
+    def query(self, x0, y0, x1, y1):
+        # ids dont le coin haut-gauche peut être dans [x0, x1] x [y0, y1]
+        # (au grain de la cellule près : le test exact reste à faire)
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        return self.query_cells(cx0, cy0, cx1, cy1)
+
+    def query_cells(self, cx0, cy0, cx1, cy1):
+        # ids rangés dans les cellules [cx0, cx1] x [cy0, cy1]
+        found = []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                members = self._cells.get((cx, cy))
+                if members:
+                    found.extend(members)
+        return found
@@ -0,0 +1,23 @@
+class PositionHistory:
+    # Positions des joueurs sur les `capacity` derniers ticks, dans un tampon
+    # circulaire : le tick t est rangé dans la case t % capacity, la lecture
+    # d'un tick passé est donc O(1) et la mémoire bornée (capacity x joueurs).
+    # Sert à la compensation de latence : on teste un tir contre les
+    # positions que le tireur voyait à l'écran.
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._ticks = [None] * capacity
+        self._frames = [None] * capacity
+
+    def record(self, tick, players):
+        slot = tick % self.capacity
+        self._ticks[slot] = tick
+        self._frames[slot] = {pid: (p["x"], p["y"]) for pid, p in players.items()}
+
+    def at(self, tick):
+        # {pid: (x, y)} au tick demandé, None s'il est sorti du tampon
+        slot = tick % self.capacity
+        if self._ticks[slot] != tick:
+            return None
+        return self._frames[slot]
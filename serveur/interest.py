@@ -0,0 +1,59 @@
+import math
+
+# Filtrage par zone d'intérêt : un client qui s'abonne avec une vue ne
+# reçoit que les entités de ce rectangle, élargi de AOI_MARGIN pour que ce
+# qui arrive au bord soit déjà connu. Les salles rangent leurs joueurs dans
+# une grille à grosses cellules (SpatialGrid, mise à jour seulement quand
+# un joueur change de cellule) : une vue se ramène à une plage de cellules,
+# et l'état filtré est encodé une fois par tick et par plage, quel que soit
+# le nombre de clients qui la partagent.
+#
+#   ?view=x,y,w,h   rectangle fixe (coordonnées du monde)
+#   ?view=auto      écran du client (VIEW_WIDTH x VIEW_HEIGHT) centré sur son joueur
+
+AOI_CELL = 160
+AOI_MARGIN = 100
+VIEW_WIDTH, VIEW_HEIGHT = 640, 480  # écran du client (client/main.py)
+
+
+class View:
+    # rect : (x, y, w, h) fixe ; pid : vue qui suit ce joueur
+
+    __slots__ = ("rect", "pid")
+
+    def __init__(self, rect=None, pid=None):
+        self.rect = rect
+        self.pid = pid
+
+    def cells(self, players, player_size, width, height):
+        # plage de cellules (cx0, cy0, cx1, cy1) couverte, marge comprise,
+        # bornée au monde ; None si le joueur suivi n'est plus là (on envoie alors tout)
+        if self.pid is not None:
+            p = players.get(self.pid)
+            if p is None:
+                return None
+            x = p["x"] + player_size / 2 - VIEW_WIDTH / 2
+            y = p["y"] + player_size / 2 - VIEW_HEIGHT / 2
+            w, h = VIEW_WIDTH, VIEW_HEIGHT
+        else:
+            x, y, w, h = self.rect
+        # les entités sont rangées par leur coin haut-gauche : une entité qui
+        # déborde dans la vue par la gauche ou le haut est couverte par la marge
+        def cell(v, size):
+            return max(0, min(size // AOI_CELL, math.floor(v / AOI_CELL)))
+        return (cell(x - AOI_MARGIN, width), cell(y - AOI_MARGIN, height),
+                cell(x + w + AOI_MARGIN, width), cell(y + h + AOI_MARGIN, height))
+
+
+def parse_view(arg, pid=None):
+    # ?view= ; None sans filtrage, ValueError si illisible (ou "auto" sans joueur)
+    if arg is None:
+        return None
+    if arg == "auto":
+        if pid is None:
+            raise ValueError("view=auto sans joueur")
+        return View(pid=pid)
+    x, y, w, h = (float(v) for v in arg.split(","))
+    if not all(map(math.isfinite, (x, y, w, h))) or w <= 0 or h <= 0:
+        raise ValueError(arg)
+    return View(rect=(x, y, w, h))
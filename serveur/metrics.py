@@ -0,0 +1,170 @@
+import bisect
+import threading
+import time
+
+# Métriques au format texte Prometheus, servies par /metrics. Pas de
+# dépendance : compteurs et histogrammes à seaux fixes, un petit verrou par
+# série, assez léger pour rester actif en production.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LOCK_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+TICK_BUCKETS = (0.0005, 0.001, 0.002, 0.004, 0.008, 0.012, 0.016, 0.025, 0.05, 0.1)
+BUDGET_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0, 1.5, 2.0)
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterValue:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def lines(self, name, labels):
+        return [f"{name}{labels} {self.value}"]
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernier seau : +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def lines(self, name, names, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_labels(names, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(names, values)} {total}")
+        lines.append(f"{name}_count{_labels(names, values)} {cumulative}")
+        return lines
+
+
+class Metric:
+    # Une famille de séries (même nom, labels différents). labels(...) crée
+    # la série à la première utilisation puis la relit dans un dict.
+
+    def __init__(self, name, kind, help_text, labelnames=(), buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    series = _HistogramValue(self.buckets) if self.kind == "histogram" else _CounterValue()
+                    self._series[values] = series
+        return series
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in list(self._series.items()):
+            if self.kind == "histogram":
+                lines += series.lines(self.name, self.labelnames, values)
+            else:
+                lines += series.lines(self.name, _labels(self.labelnames, values))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.gauges = []  # (nom, aide, fonction) évaluée à chaque lecture de /metrics
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Metric(name, "counter", help_text, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets, labelnames=()):
+        metric = Metric(name, "histogram", help_text, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text, read):
+        self.gauges.append((name, help_text, read))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for name, help_text, read in self.gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {read()}"]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter("jeumulti_http_requests_total", "Requêtes HTTP par route, méthode et code.",
+                            ("route", "method", "status"))
+REQUEST_DURATION = REGISTRY.histogram("jeumulti_http_request_duration_seconds", "Durée des requêtes HTTP par route.",
+                                      LATENCY_BUCKETS, ("route",))
+LOCK_WAIT = REGISTRY.histogram("jeumulti_lock_wait_seconds", "Attente avant d'obtenir un verrou.",
+                               LOCK_BUCKETS, ("lock",))
+LOCK_HOLD = REGISTRY.histogram("jeumulti_lock_hold_seconds", "Durée de détention d'un verrou.",
+                               LOCK_BUCKETS, ("lock",))
+TICK_DURATION = REGISTRY.histogram("jeumulti_tick_duration_seconds", "Durée d'un tick de simulation (toutes salles).",
+                                   TICK_BUCKETS)
+TICK_OVERRUNS = REGISTRY.counter("jeumulti_tick_overruns_total", "Ticks plus longs que leur période.")
+TICK_BUDGET = REGISTRY.histogram("jeumulti_tick_budget_ratio", "Part de la période d'un tick passée à le calculer.",
+                                 BUDGET_BUCKETS)
+TICK_SKIPPED = REGISTRY.counter("jeumulti_ticks_skipped_total",
+                                "Ticks abandonnés après un retard trop long (le jeu a ralenti).")
+TICK_ERRORS = REGISTRY.counter("jeumulti_tick_errors_total",
+                               "Exceptions levées par la simulation (une salle ou un tick), écrites sur stderr.")
+
+
+class TimedLock:
+    # threading.Lock qui mesure l'attente et la détention. Un seul thread
+    # détient le verrou à la fois : l'heure d'acquisition peut vivre sur
+    # l'instance.
+
+    def __init__(self, name):
+        self._lock = threading.Lock()
+        self._wait = LOCK_WAIT.labels(name)
+        self._hold = LOCK_HOLD.labels(name)
+        self._acquired_at = 0.0
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self._lock.acquire()
+        self._acquired_at = time.perf_counter()
+        self._wait.observe(self._acquired_at - start)
+        return self
+
+    def __exit__(self, *exc):
+        held = time.perf_counter() - self._acquired_at
+        self._lock.release()
+        self._hold.observe(held)
+        return False
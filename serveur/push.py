@@ -0,0 +1,133 @@
+import asyncio
+import json
+import queue
+import socket
+import threading
+
+
+class Broadcaster:
+    # Websockets abonnés à l'état du jeu. Le serveur encode l'état une
+    # seule fois par tick et par format puis l'envoie à tout le monde via
+    # publish(). Chaque abonné a sa file bornée et son thread d'envoi, seul
+    # à écrire sur son socket : le thread du tick ne fait que déposer. Un
+    # abonné qui ne suit pas (file pleine) est lâché et sa connexion coupée,
+    # comme avec QueueBroadcaster.
+
+    MAX_PENDING = 64
+
+    def __init__(self):
+        self._subscribers = {}  # {ws: (file, format, vue)}
+        self._lock = threading.Lock()
+
+    def subscribe(self, ws, fmt="json", view=None):
+        # view : interest.View, l'abonné ne reçoit que sa zone
+        pending = queue.Queue(self.MAX_PENDING)
+        with self._lock:
+            self._subscribers[ws] = (pending, fmt, view)
+        threading.Thread(target=self._writer, args=(ws, pending), daemon=True).start()
+
+    def unsubscribe(self, ws):
+        with self._lock:
+            entry = self._subscribers.pop(ws, None)
+        if entry is None:
+            return
+        # None : le thread d'envoi s'arrête (on fait de la place si besoin)
+        pending = entry[0]
+        while True:
+            try:
+                pending.put_nowait(None)
+                return
+            except queue.Full:
+                try:
+                    pending.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def _writer(self, ws, pending):
+        while True:
+            message = pending.get()
+            if message is None:
+                return
+            try:
+                ws.send(message)
+            except Exception:
+                self.unsubscribe(ws)
+                return
+
+    def send(self, ws, message):
+        # appelé par le thread de tick et par le handler de la connexion :
+        # la file garde l'ordre, aucun des deux n'attend le réseau
+        if not isinstance(message, (str, bytes)):
+            message = json.dumps(message)
+        with self._lock:
+            pending = self._subscribers.get(ws, (None,))[0]
+        if pending is None:
+            return False
+        try:
+            pending.put_nowait(message)
+            return True
+        except queue.Full:
+            # le client ne lit plus : couper le socket débloque aussi son
+            # thread d'envoi et le handler qui attend ses messages
+            self.unsubscribe(ws)
+            sock = getattr(ws, "sock", None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            return False
+
+    def publish(self, messages, render=None):
+        # messages : {format: message déjà encodé} ; render(vue, format) :
+        # message d'un abonné avec une vue (mis en cache par la salle)
+        with self._lock:
+            subscribers = [(ws, fmt, view) for ws, (_, fmt, view) in self._subscribers.items()]
+        for ws, fmt, view in subscribers:
+            self.send(ws, messages[fmt] if view is None or render is None else render(view, fmt))
+
+
+class QueueBroadcaster:
+    # Même interface pour le serveur asyncio (asgi.py) : tout tourne sur la
+    # boucle d'événements, publish() dépose le message dans la file de chaque
+    # abonné et la tâche de sa connexion l'envoie. Un abonné qui ne suit pas
+    # (file pleine) est lâché : None dans sa file lui dit de fermer.
+
+    MAX_PENDING = 64
+
+    def __init__(self):
+        self._subscribers = {}  # {connexion: (file, format, vue)}
+
+    def subscribe(self, ws, fmt="json", view=None):
+        queue = asyncio.Queue(self.MAX_PENDING)
+        self._subscribers[ws] = (queue, fmt, view)
+        return queue
+
+    def unsubscribe(self, ws):
+        self._subscribers.pop(ws, None)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def send(self, ws, message):
+        if not isinstance(message, (str, bytes)):
+            message = json.dumps(message)
+        queue = self._subscribers.get(ws, (None,))[0]
+        if queue is None:
+            return False
+        try:
+            queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.unsubscribe(ws)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+            return False
+
+    def publish(self, messages, render=None):
+        for ws, (_, fmt, view) in list(self._subscribers.items()):
+            self.send(ws, messages[fmt] if view is None or render is None else render(view, fmt))
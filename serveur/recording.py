@@ -0,0 +1,353 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+from commun import protocole
+
+# Enregistrement d'une partie (une salle, de sa création à sa fermeture)
+# dans un fichier binaire où l'on ne fait qu'ajouter, un enregistrement par
+# tick, plus un index à côté (même nom + ".idx") pour aller directement à
+# n'importe quel tick. Sert à rejouer un désync, une collision ou un kill
+# contesté, et à mesurer la simulation sur du vrai trafic (replay.py).
+#
+#   en-tête       "JREC", version u16, longueur u32, métadonnées JSON
+#   tick          tick u32, durée du tick f64, version u32, état u8 (0 aucun, 1 complet,
+#                 2 diff), nb événements u16, nb entrées u16, longueur
+#                 de l'état u32 ; puis événements, entrées, état
+#   événement     genre u8 (1 arrivée, 2 départ), pendant le tick u8,
+#                 pid u32, raison u8, x f64, y f64, longueur u8 ; puis le pseudo
+#   entrée        pid u32, seq u32, flags u8 (protocole.INPUT_*), dx, dy,
+#                 x, y (cible ou tir), dt, latence, t f64   (entrée telle
+#                 qu'appliquée par step_player, en f64 pour rejouer à l'identique)
+#   état          commun/protocole.py : complet tous les KEYFRAME_TICKS,
+#                 sinon le diff depuis le tick précédent (s'il a changé)
+#   index         tick u32, position u64, position du dernier complet u64
+
+MAGIC = b"JREC"
+FORMAT_VERSION = 3
+KEYFRAME_TICKS = 60  # un état complet par seconde de jeu
+
+NO_STATE = 0
+JOIN, LEAVE = 1, 2
+REASONS = ["left", "idle", "killed"]
+
+_HEADER = struct.Struct("<4sHI")
+_RECORD = struct.Struct("<IdIBHHI")
+_EVENT = struct.Struct("<BBIBddB")
+_COMMAND = struct.Struct("<IIBddddddd")
+_ENTRY = struct.Struct("<IQQ")
+
+
+def encode_command(pid, cmd):
+    flags, x, y, lag = 0, 0.0, 0.0, 0.0
+    dx, dy = cmd.get("dir", (0.0, 0.0))
+    if "dir" in cmd:
+        flags |= protocole.INPUT_DIR
+    if "target" in cmd:
+        flags |= protocole.INPUT_TARGET
+        x, y = cmd["target"]
+    if "fire" in cmd:
+        flags |= protocole.INPUT_FIRE
+        x, y, lag = cmd["fire"]
+    if "dt" in cmd:
+        flags |= protocole.INPUT_DT
+    return _COMMAND.pack(int(pid), cmd["seq"], flags, dx, dy, x, y, cmd.get("dt", 0.0), lag, cmd.get("t", 0.0))
+
+
+def decode_command(buf, offset):
+    # renvoie (pid, commande au format de parse_input)
+    pid, seq, flags, dx, dy, x, y, dt, lag, t = _COMMAND.unpack_from(buf, offset)
+    cmd = {"seq": seq}
+    if flags & protocole.INPUT_DIR:
+        cmd["dir"] = (dx, dy)
+    if flags & protocole.INPUT_TARGET:
+        cmd["target"] = (x, y)
+    if flags & protocole.INPUT_FIRE:
+        cmd["fire"] = (x, y, lag)
+    if flags & protocole.INPUT_DT:
+        cmd["dt"] = dt
+    if t:
+        cmd["t"] = t
+    return str(pid), cmd
+
+
+class Recorder:
+    # Côté serveur : attaché à une salle par le Lobby, appelé sous le verrou
+    # de la salle (arrivées, départs, entrées appliquées, fin de tick). Une
+    # erreur (valeur qui ne tient pas dans le format, disque plein) arrête
+    # l'enregistrement, jamais la simulation.
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.file = open(path, "ab")
+        self.index = open(path + ".idx", "ab")
+        header = json.dumps(meta).encode()
+        self.file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(header)) + header)
+        self.in_tick = False
+        self.dt = 0.0
+        self.events = []
+        self.commands = []
+        self.keyframe = None  # position du dernier état complet
+        self.since_keyframe = 0
+        self.stopped = False
+
+    @classmethod
+    def create(cls, directory, room):
+        os.makedirs(directory, exist_ok=True)
+        name = f"salle{room.id}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jrec"
+        meta = {"room": room.id, "room_class": type(room).__name__, "started": time.time()}
+        return cls(os.path.join(directory, name), meta)
+
+    def _stop(self, error):
+        print(f"enregistrement arrêté ({self.path}) : {error!r}", file=sys.stderr)
+        self.stopped = True
+        self.events.clear()
+        self.commands.clear()
+        self.close()
+
+    def join(self, pid, name, x, y):
+        if self.stopped:
+            return
+        name = protocole.encode_name(name)
+        try:
+            self.events.append(_EVENT.pack(JOIN, self.in_tick, int(pid), 0, x, y, len(name)) + name)
+        except (struct.error, ValueError) as e:
+            self._stop(e)
+
+    def leave(self, pid, reason):
+        if self.stopped:
+            return
+        try:
+            self.events.append(_EVENT.pack(LEAVE, self.in_tick, int(pid), REASONS.index(reason), 0.0, 0.0, 0))
+        except (struct.error, ValueError) as e:
+            self._stop(e)
+
+    def command(self, pid, cmd):
+        # passé à step_player : entrée appliquée pendant ce tick
+        if self.stopped:
+            return
+        try:
+            self.commands.append(encode_command(pid, cmd))
+        except (struct.error, ValueError) as e:
+            self._stop(e)
+
+    def start_tick(self, dt):
+        self.in_tick = True
+        self.dt = dt
+
+    def end_tick(self, tick, snap, prev):
+        # snap : snapshot après le tick, prev : celui d'avant
+        if self.stopped:
+            return
+        try:
+            self._write_tick(tick, snap, prev)
+        except (struct.error, OSError) as e:
+            self._stop(e)
+
+    def _write_tick(self, tick, snap, prev):
+        offset = self.file.tell()
+        if self.keyframe is None or self.since_keyframe >= KEYFRAME_TICKS:
+            kind, state = protocole.FULL, snap.full["bin"]
+            self.keyframe = offset
+            self.since_keyframe = 0
+        elif snap is not prev:
+            kind, state = protocole.DIFF, snap.diffs[prev.version, "bin"]
+        else:
+            kind, state = NO_STATE, b""
+        self.since_keyframe += 1
+
+        self.file.write(_RECORD.pack(tick, self.dt, snap.version, kind, len(self.events), len(self.commands), len(state)))
+        self.file.write(b"".join(self.events))
+        self.file.write(b"".join(self.commands))
+        self.file.write(state)
+        self.index.write(_ENTRY.pack(tick, offset, self.keyframe))
+        if kind == protocole.FULL:
+            # sur disque à chaque état complet : un serveur tué perd au plus une seconde
+            self.file.flush()
+            self.index.flush()
+        self.events.clear()
+        self.commands.clear()
+        self.in_tick = False
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+
+def _map(path):
+    # mmap en lecture ; None pour un fichier vide (mmap refuse la taille 0)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class Recording:
+    # Côté lecture : le fichier et son index sont projetés en mémoire, un
+    # tick se lit sans rien parcourir depuis le début. Un fichier encore en
+    # cours d'écriture est lu jusqu'au dernier tick complet.
+
+    def __init__(self, path):
+        self.data = _map(path)
+        if self.data is None:
+            raise ValueError(f"{path} : fichier vide")
+        magic, version, length = _HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} : pas un enregistrement de partie (version {FORMAT_VERSION})")
+        self.meta = json.loads(self.data[_HEADER.size:_HEADER.size + length])
+        self.start = _HEADER.size + length
+        if not os.path.exists(path + ".idx"):
+            rebuild_index(self.data, self.start, path + ".idx")
+        self.index = _map(path + ".idx")
+        count = 0 if self.index is None else len(self.index) // _ENTRY.size
+        # ignore les entrées dont le tick n'est pas encore entièrement écrit
+        while count and not self._complete(count - 1):
+            count -= 1
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, i):
+        return _ENTRY.unpack_from(self.index, i * _ENTRY.size)
+
+    def _complete(self, i):
+        try:
+            _, end = read_record(self.data, self._entry(i)[1])
+        except (struct.error, UnicodeDecodeError):
+            return False
+        return end <= len(self.data)
+
+    @property
+    def first_tick(self):
+        return self._entry(0)[0]
+
+    @property
+    def last_tick(self):
+        return self._entry(self.count - 1)[0]
+
+    def find(self, tick):
+        # un enregistrement par tick : position directe, bisection par sécurité
+        i = tick - self.first_tick
+        if 0 <= i < self.count and self._entry(i)[0] == tick:
+            return i
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)[0] < tick:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._entry(lo)[0] == tick:
+            return lo
+        raise KeyError(tick)
+
+    def record(self, i):
+        return read_record(self.data, self._entry(i)[1])[0]
+
+    def records(self, start=0):
+        # enregistrements à la suite, à partir du i-ème
+        if start >= self.count:
+            return
+        offset = self._entry(start)[1]
+        for _ in range(start, self.count):
+            record, offset = read_record(self.data, offset)
+            yield record
+
+    def state_at(self, tick):
+        # état reconstruit après ce tick : dernier état complet, puis les diffs
+        i = self.find(tick)
+        _, offset, keyframe = self._entry(i)
+        state = WorldState()
+        while True:
+            record, next_offset = read_record(self.data, keyframe)
+            state.apply(record)
+            if keyframe == offset:
+                return state
+            keyframe = next_offset
+
+    def close(self):
+        self.data.close()
+        if self.index is not None:
+            self.index.close()
+
+
+def read_record(buf, offset):
+    # renvoie (enregistrement, position du suivant)
+    tick, dt, version, kind, n_events, n_commands, length = _RECORD.unpack_from(buf, offset)
+    offset += _RECORD.size
+    events = []
+    for _ in range(n_events):
+        genre, during, pid, reason, x, y, name_len = _EVENT.unpack_from(buf, offset)
+        offset += _EVENT.size
+        event = {"type": "join" if genre == JOIN else "leave", "during": bool(during), "player_id": str(pid)}
+        if genre == JOIN:
+            event.update(name=bytes(buf[offset:offset + name_len]).decode(), x=x, y=y)
+        else:
+            event["reason"] = REASONS[reason]
+        offset += name_len
+        events.append(event)
+    commands = []
+    for _ in range(n_commands):
+        commands.append(decode_command(buf, offset))
+        offset += _COMMAND.size
+    state = protocole.decode_state(buf[offset:offset + length]) if kind != NO_STATE else None
+    offset += length
+    return {"tick": tick, "dt": dt, "version": version, "events": events, "commands": commands, "state": state}, offset
+
+
+def rebuild_index(buf, start, path):
+    # index perdu (serveur tué avant de l'écrire) : un seul parcours du fichier
+    with open(path, "wb") as index:
+        offset, keyframe = start, start
+        while offset + _RECORD.size <= len(buf):
+            tick, _, _, kind, _, _, _ = _RECORD.unpack_from(buf, offset)
+            try:
+                _, next_offset = read_record(buf, offset)
+            except (struct.error, UnicodeDecodeError):
+                break  # dernier tick tronqué
+            if next_offset > len(buf):
+                break
+            if kind == protocole.FULL:
+                keyframe = offset
+            index.write(_ENTRY.pack(tick, offset, keyframe))
+            offset = next_offset
+
+
+class WorldState:
+    # état d'une salle reconstruit à partir des états enregistrés, comme le
+    # fait un client : les balles ne sont envoyées qu'au tir, leur position
+    # se déduit du tick où elles ont été vues
+    def __init__(self):
+        self.tick = 0
+        self.version = 0
+        self.players = {}
+        self.bullets = {}  # {id: (balle, tick où elle était à cette position)}
+
+    def apply(self, record):
+        self.tick = record["tick"]
+        data = record["state"]
+        if data is None:
+            return
+        self.version = data["version"]
+        if data.get("full"):
+            self.players = {}
+            self.bullets = {}
+        for pid, p in data.get("players", {}).items():
+            self.players.setdefault(pid, {}).update(p)
+        for pid in data.get("left", []):
+            self.players.pop(pid, None)
+        for b in data.get("bullets", []):
+            self.bullets[b["id"]] = (b, self.tick)
+        for bid in data.get("removed", []):
+            self.bullets.pop(bid, None)
+
+    def bullet_positions(self, tick_duration):
+        bullets = []
+        for b, seen in self.bullets.values():
+            dist = b["speed"] * tick_duration * (self.tick - seen)
+            bullets.append({**b, "x": b["x"] + b["vx"] * dist, "y": b["y"] + b["vy"] * dist})
+        return bullets
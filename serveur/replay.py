@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# commun/ (protocole partagé avec le client) est à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from commun.mesures import percentile
+from recording import Recording, WorldState
+from service import TICK
+
+# Lit une partie enregistrée par le serveur (JEUMULTI_RECORD=dossier).
+#
+#   python replay.py partie.jrec                   résumé : ticks, joueurs, morts
+#   python replay.py partie.jrec --tick 1234       état et entrées de ce tick (JSON)
+#   python replay.py partie.jrec --resimuler       rejoue les entrées dans la simulation
+#                                                  actuelle : premier tick qui diverge
+#                                                  de l'enregistrement et durée des ticks
+#
+# Le fichier est projeté en mémoire : --tick lit l'index, le dernier état
+# complet et au plus KEYFRAME_TICKS diffs, quelle que soit la longueur de la partie.
+
+TOLERANCE = 0.01  # positions enregistrées en f32
+
+
+def summary(rec):
+    joins, deaths = {}, []
+    for record in rec.records():
+        for event in record["events"]:
+            if event["type"] == "join":
+                joins[event["player_id"]] = event["name"]
+            elif event["reason"] == "killed":
+                deaths.append((record["tick"], event["player_id"]))
+    print(f"salle {rec.meta['room']} ({rec.meta['room_class']}), "
+          f"ticks {rec.first_tick} à {rec.last_tick} ({len(rec)} enregistrés)")
+    print("joueurs : " + ", ".join(f"{pid} {name}" for pid, name in joins.items()))
+    for tick, pid in deaths:
+        print(f"tick {tick} : {joins.get(pid, pid)} tué")
+
+
+def show_tick(rec, tick):
+    state = rec.state_at(tick)
+    record = rec.record(rec.find(tick))
+    print(json.dumps({
+        "tick": tick,
+        "version": state.version,
+        "players": state.players,
+        "bullets": state.bullet_positions(record["dt"]),
+        "events": record["events"],
+        "inputs": [{"player_id": pid, **cmd} for pid, cmd in record["commands"]],
+    }, indent=2))
+
+
+def room_class(name):
+    if name == "BattleRoom":
+        from combat import BattleRoom
+        return BattleRoom
+    from room import Room
+    return Room
+
+
+def diverges(room, state):
+    # premier écart entre la salle resimulée et l'état enregistré, ou None
+    if set(room.players) != set(state.players):
+        return f"joueurs {sorted(room.players)} au lieu de {sorted(state.players)}"
+    for pid, p in room.players.items():
+        q = state.players[pid]
+        if abs(p["x"] - q["x"]) > TOLERANCE or abs(p["y"] - q["y"]) > TOLERANCE:
+            return f"joueur {pid} en ({p['x']:.2f}, {p['y']:.2f}) au lieu de ({q['x']:.2f}, {q['y']:.2f})"
+    return None
+
+
+def resimulate(rec):
+    # même salle, mêmes arrivées et départs, mêmes entrées appliquées aux
+    # mêmes ticks ; les morts doivent en découler
+    room = room_class(rec.meta["room_class"])(rec.meta["room"])
+    recorded = rec.record(0)["dt"]
+    if abs(recorded - TICK) > 1e-9:
+        # latence compensée et balles dépendent de la durée du tick
+        print(f"enregistré à {1 / recorded:g} ticks/s : relancer avec JEUMULTI_TICK_RATE={1 / recorded:g}")
+    state = WorldState()
+    durations = []
+    divergence = None
+    for record in rec.records():
+        for event in record["events"]:
+            if event["during"]:
+                continue
+            if event["type"] == "join":
+                with room.lock:
+                    room.add_player(event["player_id"], event["name"], (event["x"], event["y"]))
+            else:
+                room.leave(event["player_id"])
+        for pid, cmd in record["commands"]:
+            room.inputs[pid].push(cmd)
+
+        start = time.perf_counter()
+        room.step(record["dt"])
+        durations.append(time.perf_counter() - start)
+
+        for event in record["events"]:
+            # inactivité : dépend de l'heure réelle, on la reprend telle quelle
+            if event["during"] and event["type"] == "leave" and event["reason"] == "idle":
+                room.leave(event["player_id"])
+        state.apply(record)
+        if divergence is None and room.tick != record["tick"]:
+            divergence = (record["tick"], f"tick {room.tick} resimulé")
+        if divergence is None and (record["state"] is not None or record["tick"] == rec.last_tick):
+            reason = diverges(room, state)
+            if reason is not None:
+                divergence = (record["tick"], reason)
+
+    total = sum(durations)
+    simulated = sum(record["dt"] for record in rec.records())
+    durations.sort()
+    print(f"{len(durations)} ticks resimulés en {total:.3f} s "
+          f"({simulated / total if total else 0:.0f}x le temps réel)")
+    print(f"tick  moy {total / len(durations) * 1000:.3f} ms  p50 {percentile(durations, 50) * 1000:.3f}  "
+          f"p95 {percentile(durations, 95) * 1000:.3f}  p99 {percentile(durations, 99) * 1000:.3f}")
+    if divergence is None:
+        print("identique à l'enregistrement")
+    else:
+        print(f"diverge au tick {divergence[0]} : {divergence[1]}")
+    return divergence is None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relecture d'une partie enregistrée")
+    parser.add_argument("fichier")
+    parser.add_argument("--tick", type=int, help="état et entrées à ce tick")
+    parser.add_argument("--resimuler", action="store_true",
+                        help="rejoue les entrées dans la simulation actuelle et compare")
+    args = parser.parse_args()
+
+    rec = Recording(args.fichier)
+    if not len(rec):
+        print("aucun tick enregistré")
+        return
+    if args.tick is not None:
+        if not rec.first_tick <= args.tick <= rec.last_tick:
+            sys.exit(f"tick {args.tick} absent : ticks {rec.first_tick} à {rec.last_tick}")
+        show_tick(rec, args.tick)
+    elif args.resimuler:
+        sys.exit(0 if resimulate(rec) else 1)
+    else:
+        summary(rec)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+import json
+import sys
+import time
+import traceback
+import unicodedata
+
+from commun import protocole
+from commun.regles import BOUNDS, HEIGHT, PLAYER_SIZE, WIDTH, overlaps
+from delta import ChangeLog
+from expiry import IdleReaper
+from grid import SpatialGrid
+from interest import AOI_CELL
+from metrics import TICK_ERRORS, TimedLock
+from push import Broadcaster
+from recording import Recorder
+from sessions import SessionRegistry
+from simulation import MAX_QUEUED_INPUTS, PlayerInput, parse_input, step_player
+
+MAX_PLAYERS = 4
+IDLE_TIMEOUT = 30  # secondes sans aucune entrée avant d'être sorti de la partie
+
+# encodages de l'état : JSON par défaut, binaire compact (commun/protocole.py)
+# pour les clients qui le demandent
+ENCODERS = {
+    "json": lambda data: json.dumps({"type": "state", **data}),
+    "bin": protocole.encode_state,
+}
+
+
+def normalize_name(name):
+    # deux pseudos qui ne diffèrent que par la casse ou la forme unicode sont le même
+    return unicodedata.normalize("NFKC", name).casefold()
+
+
+class Snapshot:
+    # État d'une salle encodé une seule fois par tick (si quelque chose a
+    # changé). /state renvoie ces octets tels quels, sans verrou ni jsonify.
+    # `full` : {format: corps} ; `diffs` mémorise les diffs déjà encodés
+    # vers cette version, par (since, format), et `views` les états filtrés
+    # par zone d'intérêt, par (plage de cellules, format).
+
+    __slots__ = ("version", "full", "legacy", "diffs", "views")
+
+    def __init__(self, version, full, legacy):
+        self.version = version
+        self.full = full
+        self.legacy = legacy
+        self.diffs = {}
+        self.views = {}
+
+
+class Room:
+    # Une partie : ses joueurs, sa simulation, ses abonnés websocket et son
+    # propre verrou. Les requêtes ne se bloquent qu'entre joueurs de la même
+    # salle. Les méthodes sans verrou dans leur nom le prennent elles-mêmes.
+
+    def __init__(self, room_id, on_leave=None, broadcaster=None):
+        self.id = room_id
+        self.on_leave = on_leave  # prévient le lobby quand un joueur disparaît
+        self.lock = TimedLock("room")
+        self.players = {}
+        self.names = {}  # {pseudo normalisé: pid}
+        self.inputs = {}  # {pid: PlayerInput}, rempli par les handlers sans prendre le verrou
+        self.grid = SpatialGrid(PLAYER_SIZE)  # index des joueurs pour les collisions
+        self.interest = SpatialGrid(AOI_CELL)  # index des joueurs pour les vues (interest.py)
+        self.changelog = ChangeLog()
+        self.reaper = IdleReaper(IDLE_TIMEOUT)  # joueurs partis sans /leave
+        self.broadcaster = broadcaster if broadcaster is not None else Broadcaster()
+        self.tick = 0
+        self.sim_time = 0.0  # horloge de la simulation (somme des dt), envoyée avec chaque état
+        self.joins = 0
+        self.snapshot = None
+        self.recorder = None  # recording.Recorder si la partie est enregistrée
+        with self.lock:
+            self.publish()
+
+    # --- à appeler verrou pris ---
+
+    def is_full(self):
+        return len(self.players) >= MAX_PLAYERS
+
+    def name_taken(self, name):
+        return normalize_name(name) in self.names
+
+    def add_player(self, pid, name, pos=None):
+        # pos : position rendue à un joueur qui reprend sa session
+        self.joins += 1
+        x, y = pos if pos is not None else (50 * self.joins, 50)
+        self.players[pid] = {
+            "x": x,
+            "y": y,
+            "name": name,
+            "timestamp": time.time()
+        }
+        self.names[normalize_name(name)] = pid
+        self.inputs[pid] = PlayerInput()
+        self.grid.insert(pid, self.players[pid]["x"], self.players[pid]["y"])
+        self.interest.insert(pid, self.players[pid]["x"], self.players[pid]["y"])
+        self.reaper.track(pid, self.players[pid]["timestamp"])
+        self.changelog.record("join", pid)
+        if self.recorder is not None:
+            self.recorder.join(pid, name, x, y)
+
+    def remove_player(self, pid, reason="left"):
+        # reason : "left" (/leave), "idle" (inactif, peut reprendre) ou "killed"
+        self.inputs.pop(pid, None)
+        self.grid.remove(pid)
+        self.interest.remove(pid)
+        player = self.players.pop(pid, None)
+        if player is None:
+            return False
+        self.names.pop(normalize_name(player["name"]), None)
+        self.changelog.record("leave", pid)
+        if self.recorder is not None:
+            self.recorder.leave(pid, reason)
+        if self.on_leave is not None:
+            self.on_leave(pid, player, reason)
+        return True
+
+    def last_seen(self, pid):
+        # "timestamp" est rafraîchi par la simulation à chaque entrée traitée
+        player = self.players.get(pid)
+        return None if player is None else player["timestamp"]
+
+    def reap_idle(self, now):
+        # le départ passe par le changelog : les clients voient un "left"
+        for pid in self.reaper.expired(now, self.last_seen):
+            self.remove_player(pid, "idle")
+
+    def check_collision(self, pid, new_x, new_y):
+        # seuls les joueurs des cellules voisines peuvent chevaucher (new_x, new_y)
+        for other_id in self.grid.query(new_x - PLAYER_SIZE, new_y - PLAYER_SIZE, new_x + PLAYER_SIZE, new_y + PLAYER_SIZE):
+            if other_id != pid:
+                pos = self.players[other_id]
+                if overlaps(new_x, new_y, pos["x"], pos["y"]):
+                    return True
+        return False
+
+    def legacy_state(self):
+        # format de /state sans ?since (anciens clients)
+        return self.players
+
+    def full_state(self):
+        return {"version": self.changelog.version, "time": self.sim_time, "full": True, "players": self.players}
+
+    def view_state(self, cells):
+        # état complet réduit aux entités des cellules (cx0, cy0, cx1, cy1)
+        players = {pid: self.players[pid] for pid in self.interest.query_cells(*cells)}
+        return {"version": self.changelog.version, "time": self.sim_time, "full": True, "players": players}
+
+    def diff(self, since):
+        # "time" : instant de la simulation où ces positions étaient vraies ;
+        # les clients s'en servent pour interpoler les autres joueurs
+        data = self.changelog.diff(since, self.players, self.bullet_view)
+        if data is not None:
+            data["time"] = self.sim_time
+        return data
+
+    def publish(self):
+        # encode l'état courant une fois pour toutes les requêtes du tick ;
+        # le diff depuis le snapshot précédent sert au push websocket
+        prev = self.snapshot
+        full_state = self.full_state()
+        full = {fmt: encode(full_state) for fmt, encode in ENCODERS.items()}
+        snap = Snapshot(self.changelog.version, full, json.dumps(self.legacy_state()))
+        if prev is not None:
+            data = self.diff(prev.version)
+            for fmt, encode in ENCODERS.items():
+                snap.diffs[prev.version, fmt] = full[fmt] if data is None else encode(data)
+        self.snapshot = snap
+        return snap
+
+    # pas de tir ni de balles dans la salle de base (voir beta.py)
+    fire = None
+    bullet_view = None
+
+    def update(self, dt):
+        pass
+
+    # --- prennent le verrou ---
+
+    def enqueue_inputs(self, pid, inputs):
+        # le handler se contente de mettre les entrées en file, dans l'ordre du
+        # lot : c'est la boucle de simulation qui déplace le joueur, à vitesse
+        # bornée, au prochain tick. On renvoie le dernier seq déjà traité.
+        control = self.inputs.get(pid)
+        if control is None:
+            return "unknown_player", 400, None
+        try:
+            # lot trop long (client qui renvoie tout après une coupure) : comme
+            # la file du joueur, on ne garde que les plus récentes
+            commands = [parse_input(data) for data in inputs[-MAX_QUEUED_INPUTS:]]
+        except (AttributeError, TypeError, ValueError, OverflowError):
+            return "invalid_input", 400, None
+        for cmd in commands:
+            control.push(cmd)
+        return "ok", 200, control.last_seq
+
+    def enqueue_input(self, pid, data):
+        return self.enqueue_inputs(pid, [data])
+
+    def leave(self, pid):
+        with self.lock:
+            return self.remove_player(pid)
+
+    def encoded_state(self, since=None, fmt="json"):
+        # réponse de /state déjà encodée, lue dans le dernier snapshot sans
+        # prendre le verrou ; None : rien de neuf depuis `since` (réponse 304)
+        snap = self.snapshot
+        if since is None:
+            if fmt == "json":
+                return snap.legacy
+            since = -1
+        if since == snap.version:
+            return None
+        body = snap.diffs.get((since, fmt))
+        if body is not None:
+            return body
+        if since < 0 or since > snap.version:
+            return snap.full[fmt]
+        # premier client à demander ce diff pendant ce tick : on l'encode
+        # une fois et les suivants le liront dans le cache
+        encode = ENCODERS[fmt]
+        with self.lock:
+            data = self.diff(since)
+            if self.snapshot is not snap or self.changelog.version != snap.version:
+                return encode(data or self.full_state())
+            body = snap.full[fmt] if data is None else encode(data)
+            snap.diffs[since, fmt] = body
+            return body
+
+    def encoded_view(self, view, since=None, fmt="json"):
+        # comme encoded_state pour un client abonné avec une vue : il reçoit
+        # l'état complet de sa zone (ce qui en sort disparaît chez lui),
+        # encodé une fois par tick pour tous les clients de la même zone
+        snap = self.snapshot
+        if since == snap.version:
+            return None
+        cells = view.cells(self.players, PLAYER_SIZE, WIDTH, HEIGHT)
+        if cells is None:
+            return snap.full[fmt]
+        body = snap.views.get((cells, fmt))
+        if body is not None:
+            return body
+        with self.lock:
+            body = ENCODERS[fmt](self.view_state(cells))
+            if self.snapshot is snap and self.changelog.version == snap.version:
+                snap.views[cells, fmt] = body
+            return body
+
+    def step(self, dt):
+        # un tick : entrées en file de chaque joueur, hook update() (balles),
+        # joueurs inactifs, puis un nouveau snapshot si quelque chose a changé, dont le diff
+        # est poussé tel quel à tous les abonnés
+        recorder = self.recorder
+        with self.lock:
+            self.tick += 1
+            self.sim_time += dt
+            if recorder is not None:
+                recorder.start_tick(dt)
+            record = recorder.command if recorder is not None else None
+            for pid, p in list(self.players.items()):
+                if step_player(pid, p, self.inputs[pid], dt, BOUNDS, self.check_collision, self.fire, record):
+                    self.grid.insert(pid, p["x"], p["y"])
+                    self.interest.insert(pid, p["x"], p["y"])
+                    self.changelog.record("move", pid)
+
+            self.update(dt)
+            self.reap_idle(time.time())
+
+            payloads = None
+            prev = self.snapshot
+            if self.changelog.version != prev.version:
+                snap = self.publish()
+                if self.broadcaster.has_subscribers():
+                    payloads = {fmt: snap.diffs[prev.version, fmt] for fmt in ENCODERS}
+            if recorder is not None:
+                recorder.end_tick(self.tick, self.snapshot, prev)
+        # envoi hors du verrou pour ne pas bloquer les handlers HTTP
+        if payloads is not None:
+            self.broadcaster.publish(payloads, lambda view, fmt: self.encoded_view(view, None, fmt))
+
+
+class Lobby:
+    # Toutes les salles du processus. /join choisit (ou crée) une salle,
+    # ensuite tout passe par la salle du joueur : le verrou du lobby ne sert
+    # qu'aux arrivées et au ménage des salles vides. Les jetons de session
+    # (sessions.py) désignent les joueurs à la place de leur id.
+
+    def __init__(self, room_class=Room, broadcaster_class=Broadcaster, record_dir=None):
+        # broadcaster_class : Broadcaster (threads) ou QueueBroadcaster (asyncio) ;
+        # record_dir : dossier où enregistrer chaque partie (recording.py)
+        self.room_class = room_class
+        self.broadcaster_class = broadcaster_class
+        self.record_dir = record_dir
+        self.rooms = {}
+        self.player_rooms = {}  # {pid: Room}
+        self.sessions = SessionRegistry()
+        self.lock = TimedLock("lobby")
+        self.next_id = 1
+        self.next_room = 1
+
+    def _new_room(self):
+        rid = str(self.next_room)
+        self.next_room += 1
+        room = self.room_class(rid, self._forget, self.broadcaster_class())
+        if self.record_dir:
+            room.recorder = Recorder.create(self.record_dir, room)
+        self.rooms[rid] = room
+        return room
+
+    def _forget(self, pid, player, reason):
+        # appelé par une salle (sous son verrou) : simples opérations atomiques
+        # sur les dicts, le registre de sessions a son propre verrou
+        self.player_rooms.pop(pid, None)
+        if reason == "idle":
+            self.sessions.park(pid, player)
+        else:
+            self.sessions.close(pid)
+
+    def join(self, name, room_id=None):
+        # renvoie (status, code http, room, session)
+        with self.lock:
+            if room_id is not None:
+                room = self.rooms.get(str(room_id))
+                if room is None:
+                    return "unknown_room", 404, None, None
+                return self._seat([room], name, new_room=False)
+            return self._seat(list(self.rooms.values()), name)
+
+    def resume(self, session):
+        # reprise par jeton : le joueur est encore en jeu, ou il a été sorti
+        # pour inactivité et on le remet à sa dernière position, de préférence
+        # dans sa salle
+        with self.lock:
+            room = self.player_rooms.get(session.pid)
+            if room is not None:
+                return "ok", 200, room, session
+            if session.parked is None or self.sessions.get(session.token) is not session:
+                return "unknown_player", 404, None, None
+            candidates = list(self.rooms.values())
+            home = self.rooms.get(session.room_id)
+            if home is not None:
+                candidates.remove(home)
+                candidates.insert(0, home)
+            return self._seat(candidates, session.name, session)
+
+    def _seat(self, candidates, name, session=None, new_room=True):
+        # première salle avec une place et sans ce pseudo, sinon une nouvelle
+        name_clash = False
+        for room in candidates:
+            with room.lock:
+                if room.is_full():
+                    continue
+                if room.name_taken(name):
+                    name_clash = True
+                    continue
+                return self._add(room, name, session)
+
+        if not new_room:
+            if name_clash:
+                return "name_taken", 409, None, None
+            return "full", 403, None, None
+
+        room = self._new_room()
+        with room.lock:
+            return self._add(room, name, session)
+
+    def _add(self, room, name, session=None):
+        if session is None:
+            pid = str(self.next_id)
+            self.next_id += 1
+            room.add_player(pid, name)
+            session = self.sessions.open(pid, name, room.id)
+        else:
+            x, y, _ = session.parked
+            room.add_player(session.pid, name, (x, y))
+            self.sessions.resumed(session, room.id)
+        self.player_rooms[session.pid] = room
+        return "ok", 200, room, session
+
+    def leave(self, session):
+        room = self.room_of(session.pid)
+        if room is not None:
+            room.leave(session.pid)
+        else:
+            self.sessions.close(session.pid)
+
+    def room_of(self, pid):
+        return self.player_rooms.get(str(pid))
+
+    def room(self, room_id=None):
+        # salle demandée ; sans id, la première (anciens clients sans ?room)
+        if room_id is not None:
+            return self.rooms.get(str(room_id))
+        return next(iter(self.rooms.values()), None)
+
+    def step_all(self, dt):
+        # une salle qui lève n'arrête pas le tick des autres
+        for room in list(self.rooms.values()):
+            try:
+                room.step(dt)
+            except Exception:
+                TICK_ERRORS.inc()
+                print(f"salle {room.id} : erreur pendant le tick", file=sys.stderr)
+                traceback.print_exc()
+        self.sessions.purge(time.time())
+        self._drop_empty_rooms()
+
+    def _drop_empty_rooms(self):
+        with self.lock:
+            for rid, room in list(self.rooms.items()):
+                if not room.players and not room.broadcaster.has_subscribers():
+                    del self.rooms[rid]
+                    if room.recorder is not None:
+                        room.recorder.close()
@@ -0,0 +1,131 @@
+import json
+import os
+import struct
+
+from commun import protocole
+import metrics
+
+# durée d'un tick : 0.016 s (~60 ticks par seconde) par défaut ; les balles
+# ayant une collision balayée (combat.py), JEUMULTI_TICK_RATE=20 ou 30 divise
+# d'autant le coût CPU d'une salle sans rater de tir
+TICK = 1 / float(os.environ.get("JEUMULTI_TICK_RATE", 62.5))
+JSON = "application/json"
+MAX_NAME = 32  # caractères d'un pseudo
+
+
+def _json(payload, code=200):
+    return code, JSON, json.dumps(payload)
+
+
+def bearer_token(authorization, query_token=None):
+    # jeton rendu par /join : en-tête Authorization: Bearer, ou ?token=
+    # (websocket, dont le navigateur ne peut pas fixer les en-têtes)
+    if authorization and authorization.startswith("Bearer "):
+        return authorization[len("Bearer "):]
+    return query_token
+
+
+class GameService:
+    # Le contrat de l'API (/join, /move, /shoot, /inputs, /state, /leave,
+    # /resume, /ws) sans serveur HTTP autour : api.py (Flask, un thread par
+    # requête) et asgi.py (asyncio) n'en sont que des adaptateurs, et l'état
+    # est derrière un backend (backend.py). Les méthodes HTTP renvoient
+    # (code, type de contenu, corps).
+
+    def __init__(self, backend, shooting=False):
+        self.backend = backend
+        self.shooting = shooting
+        metrics.REGISTRY.gauge("jeumulti_rooms", "Salles ouvertes.", lambda: backend.counts()[0])
+        metrics.REGISTRY.gauge("jeumulti_players", "Joueurs en jeu.", lambda: backend.counts()[1])
+        metrics.REGISTRY.gauge("jeumulti_bullets", "Balles en vol.", lambda: backend.counts()[2])
+
+    def input_routes(self):
+        # routes qui acceptent des entrées (/shoot seulement avec le tir)
+        routes = ["/move", "/inputs"]
+        if self.shooting:
+            routes.append("/shoot")
+        return routes
+
+    def metrics(self):
+        return 200, "text/plain; version=0.0.4", metrics.REGISTRY.render()
+
+    def join(self, data):
+        # corps JSON qui n'est pas un objet ({"name": .., "room": ..}) : 400 et non 500
+        if not isinstance(data, dict):
+            return _json({"status": "invalid_request"}, 400)
+        name = data.get("name")
+        if name is not None:
+            if not isinstance(name, str):
+                return _json({"status": "invalid_name"}, 400)
+            name = name.strip()
+            if not name or len(name) > MAX_NAME:
+                return _json({"status": "invalid_name"}, 400)
+
+        status, code, joined = self.backend.join(name, data.get("room"))
+        return _json(joined if joined is not None else {"status": status}, code)
+
+    def resume(self, token):
+        # reconnexion avec le jeton, sans repasser par /join : même réponse
+        status, code, joined = self.backend.resume(token)
+        return _json(joined if joined is not None else {"status": status}, code)
+
+    def inputs(self, token, content_type, body):
+        # entrée en JSON ou en binaire (Content-Type négocié), réponse dans le même format
+        if content_type == protocole.CONTENT_TYPE:
+            try:
+                status, code, ack = self.backend.enqueue(token, protocole.decode_input(body))
+            except struct.error:
+                status, code, ack = "invalid_input", 400, None
+            return code, protocole.CONTENT_TYPE, protocole.encode_ack(status, ack)
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return _json({"status": "invalid_input", "seq": None}, 400)
+        status, code, ack = self.backend.enqueue(token, data)
+        return _json({"status": status, "seq": ack}, code)
+
+    def state(self, token, room_id, since, accept, view=None):
+        fmt = "bin" if protocole.CONTENT_TYPE in (accept or "") else "json"
+        status, code, body = self.backend.state(token, room_id, since, fmt, view)
+        if code == 304:
+            # rien de neuf depuis la version du client : réponse vide
+            return 304, None, ""
+        if body is None:
+            return _json({"status": status}, code)
+        return 200, protocole.CONTENT_TYPE if fmt == "bin" else JSON, body
+
+    def leave(self, token):
+        status, code = self.backend.leave(token)
+        return _json({"status": status}, code)
+
+    # --- websocket : même API que /move, /shoot et /state sur une seule connexion ---
+
+    def ws_open(self, token, room_id, fmt, view=None):
+        # (salle, session, vue) de la connexion ; sans jeton elle ne peut que
+        # regarder, avec ?view= elle ne reçoit que sa zone (interest.py)
+        return self.backend.stream(token, room_id, fmt, view)
+
+    def ws_state(self, room, fmt, view=None):
+        # état complet envoyé à l'ouverture et sur "resync"
+        if view is None:
+            return room.snapshot.full[fmt]
+        return room.encoded_view(view, None, fmt)
+
+    def ws_message(self, raw, room, session, fmt, view=None):
+        # réponse à un message reçu (None : pas de réponse) ; lève ValueError,
+        # KeyError, TypeError ou struct.error si le message est illisible
+        token = session.token if session is not None else None
+        if isinstance(raw, bytes):
+            status, _, ack = self.backend.enqueue(token, protocole.decode_input(raw))
+            return protocole.encode_ack(status, ack)
+        msg = json.loads(raw)
+        kind = msg.get("type")
+        if kind in ("move", "inputs") or (kind == "shoot" and self.shooting):
+            status, _, ack = self.backend.enqueue(token, msg)
+            return {"type": kind, "status": status, "seq": ack}
+        if kind == "resync":
+            return self.ws_state(room, fmt, view)
+        if kind == "ping":
+            return {"type": "pong", "t": msg.get("t")}
+        return None
+
@@ -0,0 +1,84 @@
+import secrets
+import threading
+import time
+
+from expiry import IdleReaper
+
+RESUME_GRACE = 60  # secondes pendant lesquelles un joueur sorti pour inactivité peut revenir
+
+
+class Session:
+    # Un joueur connecté : son jeton opaque, rendu par /join, remplace le
+    # player_id (prévisible) pour toutes les requêtes. `parked` : position
+    # gardée quand le joueur a été sorti pour inactivité, None sinon.
+
+    __slots__ = ("token", "pid", "name", "room_id", "parked")
+
+    def __init__(self, token, pid, name, room_id):
+        self.token = token
+        self.pid = pid
+        self.name = name
+        self.room_id = room_id
+        self.parked = None
+
+
+class SessionRegistry:
+    # Jetons -> sessions, validés en O(1) à chaque requête. Les salles le
+    # préviennent des départs (sous leur verrou) : le registre a son propre
+    # verrou et n'en prend jamais d'autre.
+
+    def __init__(self, grace=RESUME_GRACE):
+        self._by_token = {}
+        self._by_pid = {}
+        self._parked = IdleReaper(grace)  # échéances de reprise
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._by_token)
+
+    def open(self, pid, name, room_id):
+        session = Session(secrets.token_urlsafe(16), pid, name, room_id)
+        with self.lock:
+            self._by_token[session.token] = session
+            self._by_pid[pid] = session
+        return session
+
+    def get(self, token):
+        if not token:
+            return None
+        return self._by_token.get(token)
+
+    def close(self, pid):
+        with self.lock:
+            session = self._by_pid.pop(pid, None)
+            if session is not None:
+                del self._by_token[session.token]
+
+    def park(self, pid, player):
+        # le joueur a quitté sa salle sans /leave : on garde sa place le
+        # temps de la période de grâce
+        with self.lock:
+            session = self._by_pid.get(pid)
+            if session is None:
+                return
+            now = time.time()
+            session.parked = (player["x"], player["y"], now)
+            self._parked.track(session.token, now)
+
+    def resumed(self, session, room_id):
+        with self.lock:
+            session.parked = None
+            session.room_id = room_id
+
+    def _parked_since(self, token):
+        session = self._by_token.get(token)
+        if session is None or session.parked is None:
+            return None
+        return session.parked[2]
+
+    def purge(self, now):
+        # sessions en attente de reprise depuis plus que la période de grâce
+        with self.lock:
+            for token in self._parked.expired(now, self._parked_since):
+                session = self._by_token.pop(token)
+                self._by_pid.pop(session.pid, None)
@@ -0,0 +1,254 @@
+import queue
+import struct
+import threading
+from collections import deque
+from multiprocessing import AuthenticationError, shared_memory
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+# État partagé entre le processus maître de workers.py (seul à faire
+# tourner le tick) et ses processus HTTP.
+#
+# SnapshotStore : un segment de mémoire partagée découpé en MAX_ROOMS cases
+# de SLOT_SIZE octets, une par salle. Après chaque tick le maître y recopie
+# les réponses de /state déjà encodées (Snapshot de room.py) : ancien
+# format, état complet et diffs depuis les dernières versions, en JSON et
+# en binaire. Une case est protégée par un seqlock : le compteur est impair
+# pendant l'écriture, un lecteur qui voit un compteur impair ou changé
+# recommence. Une salle dont même l'ancien format et les états complets
+# dépassent SLOT_SIZE (des milliers de balles) est marquée ON_MASTER :
+# les processus HTTP demandent alors son état au maître.
+#
+#   case     seq u64, salle u32 (0 : libre), version u32, nb corps u16
+#            (ON_MASTER : aucun, trop gros), longueur utile u32
+#   corps    genre u8 (0 ancien, 1 complet, 2 diff), format u8 (0 json,
+#            1 bin), since i32, longueur u32 ; puis les octets
+
+MAX_ROOMS = 64
+SLOT_SIZE = 256 * 1024
+DIFF_HISTORY = 8  # diffs gardés : depuis chacune des dernières versions publiées
+
+LEGACY, FULL, DIFF = 0, 1, 2
+FORMATS = ["json", "bin"]
+ON_MASTER = 0xFFFF  # nb corps d'une salle trop grosse pour sa case
+
+_SLOT = struct.Struct("<QIIHI")
+_BODY = struct.Struct("<BBiI")
+_SEQ = struct.Struct("<Q")
+
+# méthodes du LocalBackend appelables par les processus HTTP
+COMMANDS = {"join", "resume", "enqueue", "room_id_for", "state", "leave", "counts"}
+
+
+class SnapshotStore:
+    def __init__(self, shm):
+        self.shm = shm
+        self.buf = shm.buf
+        self._slots = {}  # côté maître : {salle: case}
+        self._recent = {}  # côté maître : {salle: dernières versions publiées}
+
+    @classmethod
+    def create(cls):
+        return cls(shared_memory.SharedMemory(create=True, size=MAX_ROOMS * SLOT_SIZE))
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+    # --- maître, thread du tick ---
+
+    def export(self, lobby):
+        # recopie les salles dont la version a changé ; libère celles qui ont disparu
+        for rid in list(self._slots):
+            if rid not in lobby.rooms:
+                self._write(self._slots.pop(rid), 0, 0, [])
+                self._recent.pop(rid, None)
+        for rid, room in list(lobby.rooms.items()):
+            snap = room.snapshot
+            recent = self._recent.setdefault(rid, deque(maxlen=DIFF_HISTORY))
+            if recent and recent[-1] == snap.version:
+                continue
+            slot = self._slots.get(rid)
+            if slot is None:
+                slot = self._free_slot()
+                if slot is None:
+                    continue  # plus de case : la salle n'est servie que par le maître
+                self._slots[rid] = slot
+            bodies = [(LEGACY, 0, 0, snap.legacy.encode())]
+            bodies += [(FULL, i, 0, snap.full[fmt]) for i, fmt in enumerate(FORMATS)]
+            for since in recent:
+                for i, fmt in enumerate(FORMATS):
+                    body = room.encoded_state(since, fmt)
+                    if body is not None and body is not snap.full[fmt]:
+                        bodies.append((DIFF, i, since, body))
+            recent.append(snap.version)
+            self._write(slot, int(rid), snap.version, bodies)
+
+    def _free_slot(self):
+        used = set(self._slots.values())
+        for slot in range(MAX_ROOMS):
+            if slot not in used:
+                return slot
+        return None
+
+    def _write(self, slot, room_id, version, bodies):
+        base = slot * SLOT_SIZE
+        parts = []
+        for kind, fmt, since, body in bodies:
+            if isinstance(body, str):
+                body = body.encode()
+            parts.append((kind, fmt, since, body))
+        size = _SLOT.size + sum(_BODY.size + len(body) for _, _, _, body in parts)
+        while size > SLOT_SIZE and len(parts) > 3:
+            # trop gros : on garde l'ancien format et les états complets
+            kind, fmt, since, body = parts.pop()
+            size -= _BODY.size + len(body)
+        count = len(parts)
+        if size > SLOT_SIZE:
+            # même eux ne tiennent pas : la salle reste servie par le maître
+            parts = []
+            count = ON_MASTER
+
+        buf = self.buf
+        seq = _SEQ.unpack_from(buf, base)[0]
+        _SEQ.pack_into(buf, base, seq + 1)  # impair : écriture en cours
+        offset = base + _SLOT.size
+        for kind, fmt, since, body in parts:
+            _BODY.pack_into(buf, offset, kind, fmt, since, len(body))
+            offset += _BODY.size
+            buf[offset:offset + len(body)] = body
+            offset += len(body)
+        _SLOT.pack_into(buf, base, seq + 1, room_id, version, count, offset - base)
+        _SEQ.pack_into(buf, base, seq + 2)
+
+    # --- processus HTTP ---
+
+    def _copy(self, slot):
+        # copie cohérente d'une case (seqlock), None si elle change trop souvent
+        base = slot * SLOT_SIZE
+        buf = self.buf
+        for _ in range(100):
+            seq = _SEQ.unpack_from(buf, base)[0]
+            if seq % 2:
+                continue
+            _, room_id, version, count, used = _SLOT.unpack_from(buf, base)
+            data = bytes(buf[base:base + used]) if room_id else b""
+            if _SEQ.unpack_from(buf, base)[0] == seq:
+                return room_id, version, count, data
+        return None
+
+    def _find(self, room_id):
+        for slot in range(MAX_ROOMS):
+            if _SLOT.unpack_from(self.buf, slot * SLOT_SIZE)[1] == room_id:
+                return slot
+        return None
+
+    def first_room(self):
+        # salle par défaut des anciens clients (sans ?room) : la plus ancienne
+        rooms = [_SLOT.unpack_from(self.buf, slot * SLOT_SIZE)[1] for slot in range(MAX_ROOMS)]
+        rooms = [rid for rid in rooms if rid]
+        return str(min(rooms)) if rooms else None
+
+    def read(self, room_id, since, fmt):
+        # (trouvée, corps) avec la même logique que Room.encoded_state :
+        # corps None si rien de neuf depuis `since` ; trouvée vaut ON_MASTER
+        # si la salle est trop grosse pour la mémoire partagée
+        try:
+            rid = int(room_id)
+        except (TypeError, ValueError):
+            return False, None
+        slot = self._find(rid)
+        copy = None if slot is None else self._copy(slot)
+        if copy is None or copy[0] != rid:
+            return False, None
+        _, version, count, data = copy
+        if count == ON_MASTER:
+            return ON_MASTER, None
+
+        if since is None and fmt == "json":
+            wanted = (LEGACY, 0, 0)
+        elif since == version:
+            return True, None
+        else:
+            wanted = (DIFF, FORMATS.index(fmt), since)
+        full = None
+        offset = _SLOT.size
+        for _ in range(count):
+            kind, body_fmt, body_since, length = _BODY.unpack_from(data, offset)
+            offset += _BODY.size
+            key = (kind, body_fmt, body_since if kind == DIFF else 0)
+            if key == wanted:
+                return True, data[offset:offset + length]
+            if kind == FULL and FORMATS[body_fmt] == fmt:
+                full = data[offset:offset + length]
+            offset += length
+        return True, full
+
+
+class CommandServer:
+    # côté maître : les processus HTTP y appellent join, resume, enqueue,
+    # leave... du LocalBackend. Une connexion par thread HTTP en cours
+    # d'appel (gardées ouvertes par CommandClient), un thread par connexion.
+    # Le port est réservé dès la création, avant le fork des workers.
+    # L'authentification (échange HMAC) se fait dans le thread de la
+    # connexion : accept() ne sert jamais deux clients l'un après l'autre.
+
+    def __init__(self, backend, authkey, backlog=128):
+        self.backend = backend
+        self.authkey = authkey
+        self.listener = Listener(("127.0.0.1", 0), backlog=backlog)
+        self.address = self.listener.address
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                deliver_challenge(conn, self.authkey)
+                answer_challenge(conn, self.authkey)
+            except (EOFError, OSError, AuthenticationError):
+                return
+            while True:
+                try:
+                    method, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if method not in COMMANDS:
+                    conn.send((False, f"commande inconnue : {method}"))
+                    continue
+                try:
+                    conn.send((True, getattr(self.backend, method)(*args)))
+                except Exception as exc:
+                    conn.send((False, repr(exc)))
+
+
+class CommandClient:
+    # côté processus HTTP : un petit pool de connexions vers le maître,
+    # une connexion n'étant utilisée que par un thread à la fois
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self._pool = queue.LifoQueue()
+
+    def call(self, method, *args):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = Client(self.address, authkey=self.authkey)
+        try:
+            conn.send((method, args))
+            ok, result = conn.recv()
+        except (EOFError, OSError):
+            conn.close()  # maître arrêté ou connexion coupée : on ne la rend pas au pool
+            raise
+        self._pool.put(conn)
+        if not ok:
+            raise RuntimeError(result)
+        return result
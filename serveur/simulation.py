@@ -0,0 +1,147 @@
+import math
+import time
+from collections import deque
+
+from commun.protocole import U32
+from commun.regles import MAX_INPUT_DT, SPEED, timed_target, try_move
+
+MAX_QUEUED_INPUTS = 32  # au-delà on jette les plus anciennes (flood)
+MAX_INPUT_BUDGET = 0.25  # temps de déplacement qu'un joueur peut avoir en réserve
+
+
+def _number(value):
+    # nombre fini : json.loads accepte NaN et Infinity, qui ne doivent
+    # entrer ni dans la simulation ni dans /state (JSON invalide)
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError("nombre non fini")
+    return value
+
+
+def parse_input(data):
+    # commande d'entrée envoyée par le client (HTTP ou websocket) :
+    #   {"seq": n, "dx": -1..1, "dy": -1..1}   direction tenue jusqu'à la suivante
+    #   {"seq": n, "t": .., "dt": .., "dx", "dy"}  direction pendant dt secondes
+    #                                          (une image du client, envoyée par lot)
+    #   {"seq": n, "x": .., "y": ..}           ancien /move : position visée
+    #   {"seq": n, "mx": .., "my": ..}         tir vers la souris ; "lag" : retard
+    #                                          (s) de ce que le tireur voyait
+    # ValueError ou OverflowError (Infinity en seq) : entrée invalide
+    cmd = {"seq": int(data.get("seq", 0))}
+    if not 0 <= cmd["seq"] <= U32:
+        # u32 dans le protocole binaire et les enregistrements
+        raise ValueError("seq hors limites")
+    if "dx" in data or "dy" in data:
+        dx = max(-1.0, min(1.0, _number(data.get("dx", 0))))
+        dy = max(-1.0, min(1.0, _number(data.get("dy", 0))))
+        cmd["dir"] = (dx, dy)
+        if "dt" in data:
+            cmd["dt"] = max(0.0, min(MAX_INPUT_DT, _number(data["dt"])))
+    elif "x" in data and "y" in data:
+        cmd["target"] = (_number(data["x"]), _number(data["y"]))
+    if "mx" in data and "my" in data:
+        cmd["fire"] = (_number(data["mx"]), _number(data["my"]), max(0.0, _number(data.get("lag", 0))))
+    if "t" in data:
+        cmd["t"] = _number(data["t"])
+    return cmd
+
+
+class PlayerInput:
+    # File d'entrées d'un joueur. Les handlers HTTP ne font que push() (sans
+    # le verrou du jeu) ; la boucle de simulation vide la file à chaque tick.
+    # `budget` : temps réel écoulé pas encore dépensé en déplacements, pour
+    # qu'un lot d'entrées datées ne fasse pas aller plus vite que SPEED.
+
+    def __init__(self):
+        self.queue = deque(maxlen=MAX_QUEUED_INPUTS)
+        self.dir = (0.0, 0.0)
+        self.target = None
+        self.last_seq = 0
+        self.budget = 0.0
+
+    def push(self, cmd):
+        self.queue.append(cmd)
+
+    def next_command(self):
+        # prochaine entrée applicable ; une entrée datée attend en tête de file
+        # tant que le budget ne couvre pas sa durée (ordre des seq préservé)
+        try:
+            cmd = self.queue[0]
+        except IndexError:
+            return None
+        duration = cmd.get("dt")
+        if duration is not None:
+            if duration > self.budget:
+                return None
+            self.budget -= duration
+        self.queue.popleft()
+        return cmd
+
+
+def move_player(pid, player, nx, ny, bounds, collides):
+    # commun/regles.py : le client prédit son joueur avec la même règle
+    x, y = player["x"], player["y"]
+    nx, ny = try_move(x, y, nx, ny, lambda cx, cy: collides(pid, cx, cy), bounds)
+    if (nx, ny) == (x, y):
+        return False
+    player["x"] = nx
+    player["y"] = ny
+    return True
+
+
+def step_player(pid, player, control, dt, bounds, collides, fire=None, record=None):
+    # applique les entrées en attente puis avance le joueur d'un tick ;
+    # renvoie True si sa position (ou son dernier seq traité) a changé.
+    # record(pid, cmd) : appelé pour chaque entrée appliquée (recording.py)
+    changed = False
+    control.budget = min(MAX_INPUT_BUDGET, control.budget + dt)
+    while True:
+        cmd = control.next_command()
+        if cmd is None:
+            break
+        player["timestamp"] = time.time()
+        if record is not None:
+            record(pid, cmd)
+        if "dt" in cmd:
+            # entrée datée : déplacement immédiat, la direction tenue s'arrête
+            control.dir = (0.0, 0.0)
+            control.target = None
+            nx, ny = timed_target(player["x"], player["y"], *cmd["dir"], cmd["dt"])
+            if move_player(pid, player, nx, ny, bounds, collides):
+                changed = True
+        elif "dir" in cmd:
+            control.dir = cmd["dir"]
+            control.target = None
+        elif "target" in cmd:
+            control.target = cmd["target"]
+            control.dir = (0.0, 0.0)
+        if "fire" in cmd and fire is not None:
+            fire(pid, *cmd["fire"])
+        if cmd["seq"] > control.last_seq:
+            control.last_seq = cmd["seq"]
+            player["seq"] = cmd["seq"]
+            changed = True
+
+    if control.target is None and control.dir == (0.0, 0.0):
+        return changed
+    # direction tenue ou cible : elle aussi puise dans le budget
+    held = min(dt, control.budget)
+    control.budget -= held
+    x, y = player["x"], player["y"]
+    step = SPEED * held
+    if control.target is not None:
+        tx, ty = control.target
+        dist = math.hypot(tx - x, ty - y)
+        if dist <= step:
+            nx, ny = tx, ty
+            control.target = None
+        else:
+            nx = x + (tx - x) / dist * step
+            ny = y + (ty - y) / dist * step
+    else:
+        nx = x + control.dir[0] * step
+        ny = y + control.dir[1] * step
+
+    if move_player(pid, player, nx, ny, bounds, collides):
+        changed = True
+    return changed
@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import threading
+
+# commun/ (protocole partagé avec le client) est à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from backend import LocalBackend, SharedBackend
+from combat import BattleRoom
+from commun import protocole
+from room import Lobby
+from shared import FULL, LEGACY, ON_MASTER, SLOT_SIZE, CommandClient, CommandServer, SnapshotStore
+
+# Aller-retour de l'état d'une salle par la mémoire partagée de workers.py :
+#   python -m pytest serveur/test_shared.py
+
+
+@pytest.fixture
+def store():
+    store = SnapshotStore.create()
+    yield store
+    store.close()
+
+
+def battle(bullets):
+    lobby = Lobby(BattleRoom)
+    _, _, room, _ = lobby.join("a")
+    with room.lock:
+        for _ in range(bullets):
+            room.fire("1", 600, 400)
+        room.publish()
+    return lobby, room
+
+
+def test_round_trip(store):
+    lobby, room = battle(10)
+    store.export(lobby)
+    snap = room.snapshot
+    assert store.read("1", None, "json") == (True, snap.legacy.encode())
+    assert store.read("1", -1, "json") == (True, snap.full["json"].encode())
+    found, body = store.read("1", -1, "bin")
+    assert found and len(protocole.decode_state(body)["bullets"]) == 10
+    assert store.read("1", snap.version, "bin") == (True, None)
+    assert store.read("2", -1, "json") == (False, None)
+
+
+def test_diffs_dropped_when_slot_is_full(store):
+    # les diffs ne tiennent pas : l'ancien format et les états complets restent lisibles
+    big = b"x" * (SLOT_SIZE // 4)
+    bodies = [(LEGACY, 0, 0, b"legacy"), (FULL, 0, 0, b"full json"), (FULL, 1, 0, b"full bin")]
+    bodies += [(2, i % 2, i, big) for i in range(8)]
+    store._write(0, 1, 9, bodies)
+    assert store.read("1", None, "json") == (True, b"legacy")
+    assert store.read("1", 3, "bin") == (True, b"full bin")
+    assert store.read("1", 4, "json") == (True, b"full json")
+
+
+def test_room_too_big_for_its_slot(store):
+    # des milliers de balles : la case est marquée, pas de lecture au-delà
+    lobby, room = battle(1500)
+    assert len(room.snapshot.legacy) + len(room.snapshot.full["json"]) > SLOT_SIZE
+    store.export(lobby)
+    assert store.read("1", None, "json") == (ON_MASTER, None)
+    assert store.read("1", -1, "bin") == (ON_MASTER, None)
+
+
+def test_room_too_big_is_served_by_the_master(store):
+    lobby, room = battle(1500)
+    store.export(lobby)
+    commands = CommandServer(LocalBackend(lobby), b"cle")
+    threading.Thread(target=commands.serve_forever, daemon=True).start()
+    backend = SharedBackend(CommandClient(commands.address, b"cle"), store)
+    status, code, body = backend.state(None, "1", -1, "json")
+    assert (status, code) == ("ok", 200)
+    assert len(json.loads(body)["bullets"]) == 1500
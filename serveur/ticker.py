@@ -0,0 +1,78 @@
+import asyncio
+import time
+import traceback
+
+import metrics
+from service import TICK
+
+MAX_CATCH_UP = 5  # ticks en retard rattrapés d'affilée avant d'abandonner le reste
+
+
+class TickScheduler:
+    # Boucle de simulation à pas fixe sur horloge monotone. Les échéances
+    # sont calculées depuis le départ (départ + n * dt) et non après le
+    # travail : un tick lent ou un réveil tardif ne décale pas les suivants,
+    # la boucle rattrape les ticks échus (jusqu'à MAX_CATCH_UP d'affilée)
+    # et le jeu avance à la vitesse réelle même sous charge. Au-delà, le
+    # retard est abandonné et compté (jeumulti_ticks_skipped_total).
+    # step(dt) reçoit toujours la même durée, ce qui garde la simulation
+    # reproductible (replay.py) ; n'importe quelle simulation peut s'en
+    # servir : Lobby.step_all, Room.step d'une seule salle, etc. Une
+    # exception dans step est écrite sur stderr et comptée
+    # (jeumulti_tick_errors_total), la boucle continue au tick suivant.
+
+    def __init__(self, step, dt=TICK, max_catch_up=MAX_CATCH_UP, clock=time.perf_counter):
+        self.step = step
+        self.dt = dt
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self.next_tick = None  # échéance du prochain tick
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.errors = 0
+        self.usage = 0.0  # part du budget d'un tick utilisée (moyenne glissante)
+
+    def advance(self):
+        # exécute les ticks échus ; renvoie le temps à attendre avant le suivant
+        now = self.clock()
+        if self.next_tick is None:
+            self.next_tick = now + self.dt
+        done = 0
+        while now >= self.next_tick:
+            if done == self.max_catch_up:
+                missed = int((now - self.next_tick) // self.dt) + 1
+                self.next_tick += missed * self.dt
+                self.skipped += missed
+                metrics.TICK_SKIPPED.inc(missed)
+                break
+            try:
+                self.step(self.dt)
+            except Exception:
+                self.errors += 1
+                metrics.TICK_ERRORS.inc()
+                traceback.print_exc()
+            work = self.clock() - now
+            self._account(work)
+            self.next_tick += self.dt
+            done += 1
+            now = self.clock()
+        return max(0.0, self.next_tick - now)
+
+    def _account(self, work):
+        self.ticks += 1
+        usage = work / self.dt
+        self.usage += (usage - self.usage) * 0.05
+        metrics.TICK_DURATION.observe(work)
+        metrics.TICK_BUDGET.observe(usage)
+        if work > self.dt:
+            self.overruns += 1
+            metrics.TICK_OVERRUNS.inc()
+
+    def run(self):
+        while True:
+            time.sleep(self.advance())
+
+    async def run_async(self):
+        while True:
+            await asyncio.sleep(self.advance())
@@ -0,0 +1,101 @@
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+
+# commun/ (protocole partagé avec le client) est à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from werkzeug.serving import make_server
+
+from api import create_app
+from backend import LocalBackend, SharedBackend
+from room import Lobby, Room
+from shared import CommandClient, CommandServer, SnapshotStore
+from ticker import TickScheduler
+
+# Même API que main.py / beta.py, servie par plusieurs processus : le
+# processus maître est le seul à faire tourner le tick (l'état du jeu n'a
+# qu'un propriétaire) et recopie après chaque tick les réponses de /state
+# dans la mémoire partagée. Les N processus HTTP se partagent le port ;
+# ils lisent /state dans cette mémoire sans verrou ni aller-retour et
+# envoient /join, /move, /shoot, /inputs, /leave et /resume au maître.
+# Pas de push websocket ici : /ws est refusé et les clients passent au polling.
+#
+#   python workers.py             salles de base, un processus HTTP par cœur
+#   python workers.py --beta -w 4 salles avec tir, 4 processus HTTP
+
+
+def serve_worker(sock, address, authkey, store, shooting):
+    backend = SharedBackend(CommandClient(address, authkey), store)
+    app = create_app(backend=backend, shooting=shooting)
+    make_server("0.0.0.0", sock.getsockname()[1], app, threaded=True, fd=sock.fileno()).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur multi-processus")
+    parser.add_argument("--beta", action="store_true", help="salles avec tir (beta.py)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="nombre de processus HTTP")
+    parser.add_argument("--port", type=int, default=6789)
+    parser.add_argument("--record", default=os.environ.get("JEUMULTI_RECORD"),
+                        help="dossier où enregistrer chaque partie (replay.py)")
+    args = parser.parse_args()
+
+    if args.beta:
+        from combat import BattleRoom
+        lobby = Lobby(BattleRoom, record_dir=args.record)
+    else:
+        lobby = Lobby(Room, record_dir=args.record)
+
+    # le port d'abord : s'il est pris, rien n'a encore été créé
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("0.0.0.0", args.port))
+    sock.listen(128)
+
+    # la mémoire partagée survit au processus : libérée dans le finally quoi qu'il arrive
+    store = SnapshotStore.create()
+    children = []
+    try:
+        authkey = os.urandom(16)
+        commands = CommandServer(LocalBackend(lobby), authkey)
+
+        # fork avant de lancer le moindre thread dans le maître
+        for _ in range(max(1, args.workers)):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    serve_worker(sock, commands.address, authkey, store, args.beta)
+                finally:
+                    os._exit(0)
+            children.append(pid)
+        sock.close()
+
+        def stop(signum, frame):
+            raise SystemExit
+
+        signal.signal(signal.SIGTERM, stop)
+        threading.Thread(target=commands.serve_forever, daemon=True).start()
+        def step(dt):
+            lobby.step_all(dt)
+            store.export(lobby)
+
+        print(f"{len(children)} processus HTTP sur le port {args.port}")
+        TickScheduler(step).run()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        store.close()
+
+
+if __name__ == "__main__":
+    main()